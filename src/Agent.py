@@ -2,35 +2,74 @@
 
 import random
 
-from collections import OrderedDict
+from src.Utility import iter_bits
 
 
 class Agent(object):
+    """
+    Les items sont désignés par leur indice dans la liste des items du problème,
+    et un lot d'items est un masque de bits (le bit i correspond à l'item i)
+    """
 
-    def __init__(self, name, problem):
+    def __init__(self, name, problem, ranking=None):
         self.name = name
-        self.items = set()
-        self.rankings = OrderedDict()
-
-        self.generate_borda_rankings(problem.items)
+        self.items_name = problem.items     # Noms des items, utilisés seulement pour l'affichage
+        self.bundle = 0                     # Items alloués (masque de bits)
+        self.size = 0                       # Nombre d'items alloués
+        self.current_utility = 0            # Utilité des items alloués, tenue à jour à chaque allocation
+        self.scores = list()                # Item -> score de Borda
+        self.ordered_items = list()         # Items du plus au moins préféré
+        self.ranks = list()                 # Item -> rang (0 pour le préféré)
+        self.rank_masks = list()            # Rang r -> items de rang inférieur ou égal à r (masque de bits)
+
+        if ranking is None:
+            self.generate_borda_rankings(range(len(problem.items)))
+        else:
+            self.set_borda_ranks(ranking)
 
     def __str__(self):
         s = "Agent " + self.name + \
-            "\n|\t\t Items : " + str(self.items) + "\n|\t\t Utility : " + str(self.utility()) + "\n|\t\t Rankings : "
-        for index, item in enumerate(self.rankings):
-            s += item
-            if not len(self.rankings) - index == 1:
-                s += " > "
-        s += ""
+            "\n|\t\t Items : " + str(self.get_items_name()) + "\n|\t\t Utility : " + str(self.utility()) + \
+            "\n|\t\t Rankings : "
+        s += " > ".join(self.items_name[item] for item in self.ordered_items)
         return s
 
+    def copy(self):
+        """
+        Retourne une copie de l'agent. Les préférences, qui ne sont jamais modifiées par les algorithmes,
+        sont partagées avec l'original : seuls les items alloués sont copiés
+        """
+        agent = Agent.__new__(Agent)
+        agent.name = self.name
+        agent.items_name = self.items_name
+        agent.bundle = self.bundle
+        agent.size = self.size
+        agent.current_utility = self.current_utility
+        agent.scores = self.scores
+        agent.ordered_items = self.ordered_items
+        agent.ranks = self.ranks
+        agent.rank_masks = self.rank_masks
+        return agent
+
     "==========================================="
     "=============== Preferences ==============="
     "==========================================="
 
     def set_borda_ranks(self, rankings):
+        """
+        Définit les préférences de l'agent à partir d'un classement des items (du plus au moins préféré)
+        """
+        n = len(rankings)
+        self.ordered_items = list(rankings)
+        self.scores = [0] * n
+        self.ranks = [0] * n
+        self.rank_masks = list()
+        mask = 0
         for index, item in enumerate(rankings):
-            self.rankings[item] = len(rankings) - index
+            self.scores[item] = n - index
+            self.ranks[item] = index
+            mask |= 1 << item
+            self.rank_masks.append(mask)
 
     def generate_borda_rankings(self, items):
         """
@@ -38,69 +77,67 @@ class Agent(object):
         """
         items = list(items)
         random.shuffle(items)
-        for index, item in enumerate(items):
-            self.rankings[item] = len(items) - index
+        self.set_borda_ranks(items)
 
     def rank(self, item):
         """
         Retourne le rank d'un item.
-        1 préféré
-        N le moins préféré
+        0 préféré
+        N - 1 le moins préféré
         """
-        for index, _item in enumerate(self.rankings.keys()):
-            if _item == item:
-                return index
+        return self.ranks[item]
 
-    def get_items_under_rank(self, items, rank):
+    def get_items_under_rank(self, bundle, rank):
         """
-        Retourne tous les items qui ont un rang meilleur ou égal à celui donné
+        Retourne tous les items du lot qui ont un rang meilleur ou égal à celui donné
         """
-        _items = set()
-        for item in items:
-            if self.rank(item) <= rank:
-                _items.add(item)
-        return _items
+        if rank < 0:
+            return 0
+        return bundle & self.rank_masks[min(rank, len(self.rank_masks) - 1)]
 
     def utility(self):
         """
         Retourne l'utilité actuelle de l'agent
         """
-        return self.evaluate_bundle(self.items)
+        return self.current_utility
 
     def evaluate(self, item):
         """
         Retourne l'utilité d'un agent envers un bien
         """
-        return self.rankings[item]
+        return self.scores[item]
 
     def evaluate_bundle(self, bundle):
         """
         Retourne l'utilité d'un agent envers un lot (ou le score de borda d'un bundle)
         """
+        scores = self.scores
         evaluation = 0
-        for item in bundle:
-            evaluation += self.evaluate(item)
+        for item in iter_bits(bundle):
+            evaluation += scores[item]
         return evaluation
 
-    def top(self, items, value=0):
+    def top(self, bundle, value=0):
         """
         Retourne le "value" meilleur item d'un lot
         """
-        lot = OrderedDict()
-        for item in items:
-            lot[item] = self.evaluate(item)
-        sorted_lot = list(sorted(lot.items(), key=lambda x: x[1], reverse=True))
-        return sorted_lot[value][0]
+        for item in self.ordered_items:
+            if bundle >> item & 1:
+                if not value:
+                    return item
+                value -= 1
+        raise IndexError("Not enough items in bundle")
 
-    def bottom(self, items, value=0):
+    def bottom(self, bundle, value=0):
         """
         Retourne le "value" moins bon item d'un lot
         """
-        lot = dict()
-        for item in items:
-            lot[item] = self.evaluate(item)
-        sorted_lot = list(sorted(lot.items(), key=lambda x: x[1], reverse=False))
-        return sorted_lot[value][0]
+        for item in reversed(self.ordered_items):
+            if bundle >> item & 1:
+                if not value:
+                    return item
+                value -= 1
+        raise IndexError("Not enough items in bundle")
 
     def compare_bundle(self, bundle):
         """
@@ -115,16 +152,37 @@ class Agent(object):
     "=============== Items ==============="
     "====================================="
 
+    def get_items(self):
+        """
+        Retourne la liste des items alloués à cet agent
+        """
+        return list(iter_bits(self.bundle))
+
+    def get_items_name(self):
+        """
+        Retourne les noms des items alloués à cet agent
+        """
+        return set(self.items_name[item] for item in iter_bits(self.bundle))
+
     def give_item(self, item):
         """
         Donne l'item spécifié à cet agent
         """
-        self.items.add(item)
+        bit = 1 << item
+        if not self.bundle & bit:
+            self.bundle |= bit
+            self.size += 1
+            self.current_utility += self.scores[item]
         return
 
     def drop_item(self, item):
         """
         Enlève l'item spécifié d
         """
-        self.items.remove(item)
+        bit = 1 << item
+        if not self.bundle & bit:
+            raise KeyError(item)
+        self.bundle ^= bit
+        self.size -= 1
+        self.current_utility -= self.scores[item]
         return
@@ -1,22 +1,47 @@
 from abc import ABCMeta, abstractmethod
-from copy import deepcopy
+from string import Formatter
+import numpy as np
 from src.Utility import AutoNumber
 from src.Problem import BordaProperty
 
 
 class AbstractAlgorithm(object, metaclass=ABCMeta):
 
+    VERSION = 1     # A incrémenter si les résultats de l'algorithme changent (invalide le cache des résultats)
+
     class Status(AutoNumber):
         INITIALIZED = ()
         SUCCEEDED = ()
         FAILED = ()
 
+    class TraceLevel(AutoNumber):
+        OFF = ()        # Aucune trace n'est construite
+        SUMMARY = ()    # Etat initial et final
+        FULL = ()       # Etat initial, chaque étape de l'algorithme, état final
+
+    class TraceFormatter(Formatter):
+        """
+        Formate les traces : {!i} affiche le nom d'un item, {!b} les noms des items d'un lot
+        """
+
+        def __init__(self, problem):
+            self.problem = problem
+
+        def convert_field(self, value, conversion):
+            if conversion == "i":
+                return self.problem.items[value]
+            if conversion == "b":
+                return self.problem.get_items_name(value)
+            return super().convert_field(value, conversion)
+
     def __init__(self, problem):
-        self.problem = deepcopy(problem)
+        self.problem = problem.copy()
         self.sequence = list()
         self.status = self.Status.INITIALIZED
         self.reason = ""
         self.trace = list()
+        self.trace_level = self.TraceLevel.FULL
+        self.trace_depth = self.trace_level.value   # Valeur du niveau de trace, comparée par log
 
     def __str__(self):
         s = "|-=-=-=-=-=-=-=-=-= [ Status ]-=-=-=-=-=-=-=-=-=|\n"
@@ -32,24 +57,91 @@ class AbstractAlgorithm(object, metaclass=ABCMeta):
             s += self.get_properties_output()
         return s
 
-    def compute(self, sequence, display_trace=True):
+    def compute(self, sequence, display_trace=True, trace_level=None, metrics=None):
+        """
+        :param sequence: Séquence des agents
+        :param display_trace: Affiche la trace à la fin du calcul
+        :param trace_level: Niveau de détail de la trace (par défaut FULL si elle est affichée, OFF sinon)
+        :param metrics: Si spécifié (Metrics), mesure la durée de chaque phase du calcul et compte les opérations
+        """
+        if trace_level is None:
+            trace_level = self.TraceLevel.FULL if display_trace else self.TraceLevel.OFF
+        self.set_trace_level(trace_level)
         self.trace.clear()
         self.sequence = sequence
 
-        self.trace.append(str(self))
-        self.trace.append(self.print_start_computing())
-
-        self._compute(sequence.value)
-
-        self.problem.compute_borda_properties()
-
-        self.trace.append(self.print_end_computing())
-        self.trace.append(str(self))
+        if self.tracing(self.TraceLevel.SUMMARY):
+            # L'état du problème change pendant le calcul : il est rendu immédiatement
+            self.log(self.TraceLevel.SUMMARY, str(self))
+            self.log(self.TraceLevel.SUMMARY, self.print_start_computing())
+
+        if metrics is None:
+            self._compute(sequence.value)
+            self.problem.compute_borda_properties()
+        else:
+            metrics.instrument(self.problem)
+            metrics.instances += 1
+            with metrics.timer("_compute"):
+                self._compute(sequence.value)
+            with metrics.timer("compute_borda_properties"):
+                self.problem.compute_borda_properties()
+
+        if self.tracing(self.TraceLevel.SUMMARY):
+            self.log(self.TraceLevel.SUMMARY, self.print_end_computing())
+            self.log(self.TraceLevel.SUMMARY, str(self))
 
         if display_trace:
-            for trace in self.trace:
+            for trace in self.get_trace():
                 print(trace)
 
+    def set_trace_level(self, level):
+        self.trace_level = level
+        self.trace_depth = level.value
+
+    def tracing(self, level):
+        """
+        Retourne vrai si les traces de ce niveau sont conservées.
+        Les traces détaillées (FULL) des calculs sont construites seulement si tracing(FULL), évalué une fois
+        par calcul : sans trace, ni les appels à log ni leurs arguments ne coûtent quoi que ce soit
+        """
+        return level.value <= self.trace_depth
+
+    def log(self, level, message, *args):
+        """
+        Ajoute une trace. Le message n'est formaté (message.format(*args)) qu'au moment de l'affichage,
+        et rien n'est fait si le niveau de trace est insuffisant
+        """
+        if level.value <= self.trace_depth:
+            self.trace.append((message, args))
+
+    def get_trace(self):
+        """
+        Retourne la trace formatée
+        """
+        formatter = self.TraceFormatter(self.problem)
+        return [formatter.format(message, *args) if args else message for message, args in self.trace]
+
+    @classmethod
+    def compute_batch(cls, batch, sequence):
+        """
+        Exécute l'algorithme sur chaque instance d'un lot (ProfileBatch).
+        Retourne les allocations (instances x items), le statut (Status.value) de chaque instance
+        et la raison de chaque échec.
+        Par défaut les instances sont résolues une à une, les algorithmes peuvent fournir un calcul vectorisé
+        """
+        allocations = np.empty((len(batch), batch.number_of_items()), dtype=np.int16)
+        status = np.empty(len(batch), dtype=np.int8)
+        reasons = list()
+        for index in range(len(batch)):
+            algo = cls(batch.get_problem(index))
+            algo.set_trace_level(cls.TraceLevel.OFF)
+            algo.sequence = sequence
+            algo._compute(sequence.value)
+            allocations[index] = batch.get_allocation(algo.problem)
+            status[index] = algo.status.value
+            reasons.append(algo.reason)
+        return allocations, status, reasons
+
     @abstractmethod
     def _compute(self, sequence):
         raise NotImplementedError
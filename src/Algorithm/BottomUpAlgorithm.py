@@ -1,3 +1,5 @@
+import numpy as np
+
 from src.Algorithm.AbstractAlgorithm import AbstractAlgorithm
 
 """
@@ -16,30 +18,71 @@ the agent who appreciate the most this item and to even allocation (All agents m
 class BottomUpAlgorithm(AbstractAlgorithm):
 
     def _compute(self, sequence):
+        full = self.tracing(self.TraceLevel.FULL)
         # On considère chaque agent en suivant la séquence
         counter = 1
         for agent_name in sequence:
-            self.trace.append("----- Round " + str(counter) + "-----")
-            self.trace.append("Remaining sequence " + str(sequence[counter:]))
+            if full:
+                self.log(self.TraceLevel.FULL, "----- Round {}-----", counter)
+                self.log(self.TraceLevel.FULL, "Remaining sequence {}", sequence[counter:])
 
             # Récupération de l'agent
             agent = self.problem.agents[agent_name]
-            self.trace.append("... Considering agent : " + agent_name)
+            if full:
+                self.log(self.TraceLevel.FULL, "... Considering agent : {}", agent_name)
 
             # Récupération de l'item le moins valué du lot par cet agent
             least_valued_item = agent.bottom(self.problem.get_unallocated_items())
-            self.trace.append("... Least valued item : " + str(least_valued_item))
+            if full:
+                self.log(self.TraceLevel.FULL, "... Least valued item : {!i}", least_valued_item)
 
             # Récupération des agents qui peuvent recevoir un item (tous le monde doit avoir le même nb d'items)
             eligible_agents = self.problem.get_eligible_agents()
 
             # Récupération de l'agent qui value le plus cet item
             receiver = self.problem.max_utility_from(least_valued_item, eligible_agents)
-            self.trace.append("... Agent valuing this item the most : " + str(receiver))
+            if full:
+                self.log(self.TraceLevel.FULL, "... Agent valuing this item the most : {}", receiver)
 
             # Allocation de l'item
             self.problem.allocate(least_valued_item, receiver)
-            self.trace.append("... Giving item " + str(least_valued_item) + " to " + str(agent_name))
+            if full:
+                self.log(self.TraceLevel.FULL, "... Giving item {!i} to {}", least_valued_item, agent_name)
 
             counter += 1
         self.status = self.Status.SUCCEEDED
+
+    @classmethod
+    def compute_batch(cls, batch, sequence):
+        """
+        Version vectorisée : chaque étape de la séquence est traitée pour toutes les instances du lot à la fois.
+        Les allocations sont identiques à celles de _compute (à égalité, l'agent le premier dans l'ordre du lot)
+        """
+        scores = batch.scores
+        nb_instances, nb_agents, nb_items = scores.shape
+        instances = np.arange(nb_instances)
+        allocations = np.full((nb_instances, nb_items), batch.UNALLOCATED, dtype=np.int16)
+        unallocated = np.ones((nb_instances, nb_items), dtype=bool)
+        counts = np.zeros((nb_instances, nb_agents), dtype=np.int16)
+
+        for agent_name in sequence.value:
+            agent = batch.agents_name.index(agent_name)
+
+            # Item le moins valué par cet agent parmi les items non alloués
+            agent_scores = np.where(unallocated, scores[:, agent, :], np.iinfo(np.int16).max)
+            least_valued_items = np.argmin(agent_scores, axis=1)
+
+            # Agents qui peuvent recevoir un item (tous si tous ont le même nombre d'items)
+            eligible = counts < counts.max(axis=1, keepdims=True)
+            eligible[~eligible.any(axis=1)] = True
+
+            # Agent éligible qui value le plus cet item
+            item_scores = np.where(eligible, scores[instances, :, least_valued_items], -1)
+            receivers = np.argmax(item_scores, axis=1)
+
+            allocations[instances, least_valued_items] = receivers
+            unallocated[instances, least_valued_items] = False
+            counts[instances, receivers] += 1
+
+        status = np.full(nb_instances, cls.Status.SUCCEEDED.value, dtype=np.int8)
+        return allocations, status, [""] * nb_instances
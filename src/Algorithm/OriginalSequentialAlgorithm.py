@@ -1,5 +1,4 @@
 from src.Algorithm.AbstractAlgorithm import AbstractAlgorithm
-from itertools import product
 
 """
 This algorithm was introduced by Brams et al. (2015) under the name Sequential Algorithm (SA).
@@ -16,59 +15,89 @@ In the top level invocation of the procedure,l=1 .
 
 class OriginalSequentialAlgorithm(AbstractAlgorithm):
 
+    NO_ALLOCATION_FOUND = "No allocation found"
+
+    def __init__(self, problem):
+        super().__init__(problem)
+        self.explored_states = 0    # Nombre d'états (l, U) explorés par la procédure récursive
+
     def _compute(self, sequence):
         # sequence not necessary here, but included for compatibility with framework
+        full = self.tracing(self.TraceLevel.FULL)
+        agents = list(self.problem.agents.values())
+        nb_items = self.problem.number_of_items()
+
+        # (l, U) -> échec : le résultat de la procédure ne dépend que de l et des items non alloués U
+        failed_states = set()
+        self.explored_states = 0
 
-        def unattributed_under_rank(agent, l):
+        def unattributed_under_rank(agent, l, U):
             """
-            returns set of unattributed items of rank not worse than l
+            returns unattributed items of rank not worse than l, best first
             """
             # the ranks in class Agent start at 0, but l start at 1
-            rank = l - 1
-            return agent.get_items_under_rank(self.problem.get_unallocated_items(), rank)
+            return [item for item in agent.ordered_items[:l] if U >> item & 1]
 
-        SUCCESS = 1
-        FAILURE = 0
+        def distinct_items(H, index=0, used=0):
+            """
+            Génère les tuples (un item par agent, dans H[j] pour l'agent j) dont les items sont distincts
+            """
+            if index == len(H):
+                yield ()
+                return
+            for item in H[index]:
+                bit = 1 << item
+                if not used & bit:
+                    for others in distinct_items(H, index + 1, used | bit):
+                        yield (item,) + others
 
         def recursive_procedure(l=1):
 
             U = self.problem.get_unallocated_items()
 
-            if len(U) == 0:
+            if U == 0:
                 self.status = self.Status.SUCCEEDED
-                self.trace.append("Success because U was empty at the end")
-                self.trace.append("An allocation (Z_A, Z_B) has been found")
-                return SUCCESS
+                if full:
+                    self.log(self.TraceLevel.FULL, "Success because U was empty at the end")
+                    self.log(self.TraceLevel.FULL, "An allocation (Z_A, Z_B) has been found")
+                return True
 
-            self.trace.append("... Considering l = " + str(l))
+            # prevents from going into an infinite loop, and from exploring a state that already failed
+            if l > nb_items or (l, U) in failed_states:
+                return False
 
-            # prevents from going into an infinite loop
-            if (l > self.problem.number_of_items()):
-                return
-            such_pair_exist = False
+            self.explored_states += 1
+            if full:
+                self.log(self.TraceLevel.FULL, "... Considering l = {}", l)
 
-            # H contains the H_j(l) where j is agent's name (e.g. H_A(l))
-            H = dict()
-            for agent_name in self.problem.agents:
-                H[agent_name] = list(unattributed_under_rank(self.problem.agents[agent_name], l))
+            # H contains the H_j(l), in the order of the agents
+            H = [unattributed_under_rank(agent, l, U) for agent in agents]
 
             # the "i" below is just (i_A, i_B) for 2 agents
-            # the "*" is to go from a list to an iterable for "product"
-            for i in product(*[H[agent_name] for agent_name in H]):
-                # only consider case where the elements in i are distinct
-                if (len(set(i)) == len(i)):
-                    such_pair_exist = True
-                    agents_names = list(self.problem.agents.keys())
-                    for index in range(self.problem.number_of_agents()):
-                        self.problem.allocate(i[index], agents_names[index])
-                    if (recursive_procedure(l + 1) == FAILURE):
-                        # if the call failed, those objects weren't good so we must try other i
-                        for index in range(self.problem.number_of_agents()):
-                            self.problem.unallocate(i[index], agents_names[index])
+            such_pair_exist = False
+            for i in distinct_items(H):
+                such_pair_exist = True
+                for agent, item in zip(agents, i):
+                    self.problem.allocate(item, agent.name)
+                if recursive_procedure(l + 1):
+                    return True
+                # the call failed, those objects weren't good so we must try other i
+                if full:
+                    self.log(self.TraceLevel.FULL, "... Removing items {!b}", sum(1 << item for item in i))
+                for agent, item in zip(agents, i):
+                    self.problem.unallocate(item, agent.name)
 
             if not such_pair_exist:
-                self.trace.append("... No such pair exist!")
-                recursive_procedure(l + 1)
+                if full:
+                    self.log(self.TraceLevel.FULL, "... No such pair exist!")
+                if recursive_procedure(l + 1):
+                    return True
+
+            failed_states.add((l, U))
+            return False
 
         # top level invocation of the procedure
-        recursive_procedure(1)
+        if not recursive_procedure(1):
+            self.status = self.Status.FAILED
+            self.reason = self.NO_ALLOCATION_FOUND
+        self.log(self.TraceLevel.SUMMARY, "Explored states : {}", self.explored_states)
@@ -1,3 +1,5 @@
+import numpy as np
+
 from src.Algorithm.AbstractAlgorithm import AbstractAlgorithm
 
 """
@@ -12,51 +14,107 @@ mais le plus préféré par l'agent considéré lui est donné
 
 class TrumpAlgorithm(AbstractAlgorithm):
 
+    NO_ENVY_FREE_ALLOCATION = "No envy free allocation"
+
     def _compute(self, sequence):
+        full = self.tracing(self.TraceLevel.FULL)
         # On considère chaque agent en suivant la séquence
         counter = 1
         for rank in range(1, self.problem.number_of_items()+1, self.problem.number_of_agents()):
-            self.trace.append("... Considering rank " + str(rank))
+            if full:
+                self.log(self.TraceLevel.FULL, "... Considering rank {}", rank)
 
             for agent_name in sequence:
-                self.trace.append("----- Round " + str(counter) + " -----")
-                self.trace.append("Remaining sequence " + str(sequence[counter:]))
+                if full:
+                    self.log(self.TraceLevel.FULL, "----- Round {} -----", counter)
+                    self.log(self.TraceLevel.FULL, "Remaining sequence {}", sequence[counter:])
 
                 # Récupération de l'agent
                 agent = self.problem.agents[agent_name]
-                self.trace.append("... Considering agent : " + agent_name)
+                if full:
+                    self.log(self.TraceLevel.FULL, "... Considering agent : {}", agent_name)
 
                 # Récupération des items non alloués
                 unallocated_items = self.problem.get_unallocated_items()
-                self.trace.append("... Unallocated items " + str(unallocated_items))
+                if full:
+                    self.log(self.TraceLevel.FULL, "... Unallocated items {!b}", unallocated_items)
 
                 # Récupération des items possibles
                 h = agent.get_items_under_rank(unallocated_items, rank)
 
                 if not h:
-                    self.trace.append("!!! ABORT !!!  No envy free allocation")
+                    self.log(self.TraceLevel.SUMMARY, "!!! ABORT !!!  No envy free allocation")
                     self.status = self.Status.FAILED
-                    self.reason = "No envy free allocation"
+                    self.reason = self.NO_ENVY_FREE_ALLOCATION
                     return
 
                 # Récupération des autres agents
-                other_agents_name = self.problem.get_other_agents(set(agent_name))
+                other_agents_name = self.problem.get_other_agents({agent_name})
 
                 # Récupération des items les moins valué par les autres agents
-                least_valued_items = set()
+                least_valued_items = 0
                 for other_agent_name in other_agents_name:
                     other_agent = self.problem.agents[other_agent_name]
-                    least_valued_items.add(other_agent.bottom(self.problem.get_unallocated_items()))
-                self.trace.append("... Least valued items by other agents : " + str(least_valued_items))
+                    least_valued_items |= 1 << other_agent.bottom(unallocated_items)
+                if full:
+                    self.log(self.TraceLevel.FULL, "... Least valued items by other agents : {!b}",
+                             least_valued_items)
 
                 # Récupération de l'item le plus valué par l'agent considéré
                 most_valued_item = agent.top(least_valued_items)
-                self.trace.append("... Most valued item : " + str(most_valued_item))
+                if full:
+                    self.log(self.TraceLevel.FULL, "... Most valued item : {!i}", most_valued_item)
 
                 # Allocation de l'item
                 self.problem.allocate(most_valued_item, agent_name)
-                self.trace.append("... Giving item " + str(most_valued_item) + " to " + str(agent_name))
+                if full:
+                    self.log(self.TraceLevel.FULL, "... Giving item {!i} to {}", most_valued_item, agent_name)
 
                 counter += 1
 
         self.status = self.Status.SUCCEEDED
+
+    @classmethod
+    def compute_batch(cls, batch, sequence):
+        """
+        Version vectorisée : chaque étape est traitée pour toutes les instances du lot à la fois.
+        Une instance qui échoue est figée (allocation partielle, statut FAILED), comme dans _compute
+        """
+        scores = batch.scores
+        nb_instances, nb_agents, nb_items = scores.shape
+        instances = np.arange(nb_instances)
+        agents = [batch.agents_name.index(agent_name) for agent_name in sequence.value]
+        allocations = np.full((nb_instances, nb_items), batch.UNALLOCATED, dtype=np.int16)
+        unallocated = np.ones((nb_instances, nb_items), dtype=bool)
+        running = np.ones(nb_instances, dtype=bool)
+        highest = np.iinfo(np.int16).max
+
+        for rank in range(1, nb_items + 1, nb_agents):
+            # Le rang (à partir de 0) d'un item est nb_items - score
+            under_rank = scores >= nb_items - rank
+
+            for agent in agents:
+                # Sans item de rang suffisant, l'instance échoue
+                h = np.any(unallocated & under_rank[:, agent, :], axis=1)
+                running &= h
+                if not running.any():
+                    break
+
+                # Items les moins valués par les autres agents
+                least_valued_items = np.zeros((nb_instances, nb_items), dtype=bool)
+                for other_agent in range(nb_agents):
+                    if other_agent != agent:
+                        other_scores = np.where(unallocated, scores[:, other_agent, :], highest)
+                        least_valued_items[instances, np.argmin(other_scores, axis=1)] = True
+
+                # Item le plus valué par l'agent considéré
+                agent_scores = np.where(least_valued_items, scores[:, agent, :], -1)
+                most_valued_items = np.argmax(agent_scores, axis=1)
+
+                allocated = instances[running]
+                allocations[allocated, most_valued_items[running]] = agent
+                unallocated[allocated, most_valued_items[running]] = False
+
+        status = np.where(running, cls.Status.SUCCEEDED.value, cls.Status.FAILED.value).astype(np.int8)
+        reasons = ["" if succeeded else cls.NO_ENVY_FREE_ALLOCATION for succeeded in running]
+        return allocations, status, reasons
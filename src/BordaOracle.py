@@ -0,0 +1,193 @@
+# coding: utf8
+
+"""
+Oracles exacts pour les propriétés de Borda globales (somme maximale, ...).
+
+Les oracles travaillent sur une matrice de scores : scores[i][j] est le score de Borda
+de l'item j pour l'agent i. Une allocation est équilibrée : chaque agent reçoit
+exactement items_per_agent items.
+"""
+
+
+class BordaOracle(object):
+
+    VERSION = 1     # A incrémenter si les résultats des oracles changent (invalide le cache des résultats)
+
+    @staticmethod
+    def max_borda_sum(scores, items_per_agent, metrics=None):
+        """
+        Retourne la somme maximale des scores de Borda parmi toutes les allocations équilibrées,
+        ainsi qu'une allocation témoin (liste, pour chaque agent, des indices des items reçus).
+
+        Le problème est un problème d'affectation : chaque agent dispose de items_per_agent places,
+        et chaque item doit occuper une place. Résolu par l'algorithme hongrois en O(n^3)
+        :param metrics: Si spécifié, compte les étapes de l'algorithme hongrois (Metrics)
+        """
+        nb_agents = len(scores)
+        nb_items = nb_agents * items_per_agent
+        if nb_items == 0:
+            return 0, [list() for _ in range(nb_agents)]
+
+        # Une ligne par place : la place s appartient à l'agent s // items_per_agent
+        cost = [[-value for value in scores[slot // items_per_agent]] for slot in range(nb_items)]
+        assignment = BordaOracle.hungarian(cost, metrics)
+
+        bundles = [list() for _ in range(nb_agents)]
+        max_sum = 0
+        for item, slot in enumerate(assignment):
+            agent = slot // items_per_agent
+            bundles[agent].append(item)
+            max_sum += scores[agent][item]
+        return max_sum, bundles
+
+    @staticmethod
+    def hungarian(cost, metrics=None):
+        """
+        Résout le problème d'affectation de coût minimal pour une matrice carrée.
+        Retourne, pour chaque colonne, l'indice de la ligne qui lui est affectée
+        """
+        n = len(cost)
+        infinity = float("inf")
+        u = [0] * (n + 1)
+        v = [0] * (n + 1)
+        row_of = [0] * (n + 1)  # row_of[j] : ligne (indexée à partir de 1) affectée à la colonne j
+        way = [0] * (n + 1)
+        steps = 0
+
+        for row in range(1, n + 1):
+            row_of[0] = row
+            j0 = 0
+            min_v = [infinity] * (n + 1)
+            used = [False] * (n + 1)
+            while True:
+                steps += 1
+                used[j0] = True
+                i0 = row_of[j0]
+                cost_row = cost[i0 - 1]
+                u_i0 = u[i0]
+                delta = infinity
+                j1 = 0
+                for j in range(1, n + 1):
+                    if not used[j]:
+                        current = cost_row[j - 1] - u_i0 - v[j]
+                        if current < min_v[j]:
+                            min_v[j] = current
+                            way[j] = j0
+                        if min_v[j] < delta:
+                            delta = min_v[j]
+                            j1 = j
+                for j in range(n + 1):
+                    if used[j]:
+                        u[row_of[j]] += delta
+                        v[j] -= delta
+                    else:
+                        min_v[j] -= delta
+                j0 = j1
+                if row_of[j0] == 0:
+                    break
+            # Mise à jour du chemin augmentant
+            while True:
+                j1 = way[j0]
+                row_of[j0] = row_of[j1]
+                j0 = j1
+                if j0 == 0:
+                    break
+
+        if metrics is not None:
+            metrics.count("BordaOracle.hungarian_steps", steps)
+        return [row_of[j] - 1 for j in range(1, n + 1)]
+
+    @staticmethod
+    def max_borda_max_min(scores, items_per_agent, metrics=None):
+        """
+        Retourne le max min des scores de Borda parmi toutes les allocations équilibrées,
+        ainsi qu'une allocation témoin (liste, pour chaque agent, des indices des items reçus).
+
+        Recherche en profondeur (séparation et évaluation) : les items sont attribués un à un, des plus disputés
+        aux moins disputés (voir get_contested_order), pour que les bornes se resserrent dès le haut de l'arbre.
+        La borne supérieure d'un agent est son score courant plus la somme de ses meilleurs items
+        restants pour les places qui lui restent. Une branche dont le minimum de ces bornes ne peut
+        pas dépasser la meilleure solution connue est abandonnée. Mémoire en O(nombre d'items)
+        :param metrics: Si spécifié, compte les noeuds explorés et les allocations complètes atteintes (Metrics)
+        """
+        nb_agents = len(scores)
+        nb_items = nb_agents * items_per_agent
+        if nb_items == 0:
+            return 0, [list() for _ in range(nb_agents)]
+
+        # La recherche travaille sur les items renumérotés dans l'ordre de get_contested_order
+        order = BordaOracle.get_contested_order(scores)
+        scores = [[agent_scores[item] for item in order] for agent_scores in scores]
+
+        # Items de chaque agent du plus au moins valué, pour le calcul des bornes
+        preferences = [sorted(range(nb_items), key=lambda item: -agent_scores[item]) for agent_scores in scores]
+        # Pour chaque item, les agents du plus au moins intéressé, pour trouver rapidement de bonnes solutions
+        candidates = [sorted(range(nb_agents), key=lambda agent: -scores[agent][item]) for item in range(nb_items)]
+
+        owner = [-1] * nb_items
+        counts = [0] * nb_agents
+        totals = [0] * nb_agents
+
+        # La solution de somme maximale sert de solution initiale
+        _, best_bundles = BordaOracle.max_borda_sum(scores, items_per_agent, metrics)
+        explored = [0, 0]   # Noeuds explorés, allocations complètes
+        best = [min(sum(scores[agent][item] for item in bundle) for agent, bundle in enumerate(best_bundles))]
+
+        def upper_bound(depth):
+            bound = None
+            for agent in range(nb_agents):
+                value = totals[agent]
+                remaining = items_per_agent - counts[agent]
+                if remaining:
+                    agent_scores = scores[agent]
+                    for item in preferences[agent]:
+                        # Les items d'indice >= depth ne sont pas encore attribués
+                        if item >= depth:
+                            value += agent_scores[item]
+                            remaining -= 1
+                            if not remaining:
+                                break
+                if bound is None or value < bound:
+                    bound = value
+            return bound
+
+        def search(depth):
+            explored[0] += 1
+            if depth == nb_items:
+                explored[1] += 1
+                value = min(totals)
+                if value > best[0]:
+                    best[0] = value
+                    for bundle in best_bundles:
+                        bundle.clear()
+                    for item, agent in enumerate(owner):
+                        best_bundles[agent].append(item)
+                return
+
+            if upper_bound(depth) <= best[0]:
+                return
+
+            for agent in candidates[depth]:
+                if counts[agent] < items_per_agent:
+                    owner[depth] = agent
+                    counts[agent] += 1
+                    totals[agent] += scores[agent][depth]
+                    search(depth + 1)
+                    totals[agent] -= scores[agent][depth]
+                    counts[agent] -= 1
+                    owner[depth] = -1
+
+        search(0)
+        if metrics is not None:
+            metrics.count("BordaOracle.max_min_nodes", explored[0])
+            metrics.count("BordaOracle.max_min_allocations", explored[1])
+        return best[0], [sorted(order[item] for item in bundle) for bundle in best_bundles]
+
+    @staticmethod
+    def get_contested_order(scores):
+        """
+        Retourne les items du plus au moins disputé : par somme décroissante des scores des agents (à égalité, par
+        indice croissant). Les items que tous les agents valorisent fixent le max min ; les attribuer en premier
+        fait apparaître tôt les bonnes solutions et les branches sans issue, quelle que soit la numérotation des items
+        """
+        return sorted(range(len(scores[0])), key=lambda item: -sum(agent_scores[item] for agent_scores in scores))
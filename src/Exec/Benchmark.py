@@ -7,6 +7,7 @@ Exemple de fichier permettant de lancer un benchmark sur un jeu de données gén
 from src.Database import *
 from src.Problem import *
 from src.ProblemSet import *
+from src.ResultCache import ResultCache
 from src.Sequence import *
 from src.Algorithm import *
 
@@ -21,7 +22,9 @@ initial_pb = Problem(db.get_random_agents_names(nbAgents), db.get_random_items_n
 # Create a set of different instances of a problem
 algorithms = [BottomUpAlgorithm, TrumpAlgorithm]
 limit = 100
-pb_set = ProblemSet(initial_pb, algorithms, limit, "../../")
+# Les résultats des instances déjà résolues lors d'une exécution précédente sont relus dans le cache
+cache = ResultCache("../../out/cache.sqlite")
+pb_set = ProblemSet(initial_pb, algorithms, limit, "../../", cache=cache)
 
 # Test with a specific sequence
 seq = Sequence.generate(initial_pb, SequenceType.ROUND_ROBIN, True)
@@ -7,6 +7,7 @@ Multi run Benchmark
 from src.Database import *
 from src.Problem import *
 from src.ProblemSet import *
+from src.ResultCache import ResultCache
 from src.Sequence import *
 from src.Algorithm import *
 
@@ -19,18 +20,22 @@ maxNbItems = 4
 # Load database
 db = Database()
 
+# Results of instances already solved by a previous execution are read from this cache
+cache = ResultCache("../../out/cache.sqlite")
+
 for i in range(minNbAgent, maxNbAgent + 1):
     for j in range(minNbItems, maxNbItems + 1):
         # Define a problem
         nbAgents = i
         nbItems = nbAgents * j
-        initial_pb = Problem(db.get_random_agents_names(nbAgents), db.get_random_items_names(nbItems))
+        # Same names (and agent order) on every execution, so that an interrupted run can be resumed
+        initial_pb = Problem(sorted(db.agents_names)[:nbAgents], sorted(db.items_names)[:nbItems])
 
         # Create a set of different instances of a problem
         algorithms = [BottomUpAlgorithm, TrumpAlgorithm]
-        pb_set = ProblemSet(initial_pb, algorithms, limit, "../../")
+        pb_set = ProblemSet(initial_pb, algorithms, limit, "../../", cache=cache)
 
-        # Test with a specific sequence
+        # Test with a specific sequence. Results are checkpointed : an interrupted run resumes where it stopped
         seq = Sequence.generate(initial_pb, SequenceType.BALANCED)
-        pb_set.run(seq)
+        pb_set.run(seq, checkpoint="../../out/checkpoints/" + str(nbAgents) + "x" + str(nbItems), resume=True)
         pb_set.show_results(True)
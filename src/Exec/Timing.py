@@ -0,0 +1,190 @@
+# coding: utf8
+
+"""
+Benchmark de performance : mesure le temps de calcul des algorithmes et des vérifications des propriétés de Borda
+sur des instances générées aléatoirement (graine fixée), pour chaque taille de problème (agents x items).
+
+Les mesures (médiane, 95e centile, instances par seconde, pic mémoire) sont écrites au format JSON.
+Deux fichiers de mesures peuvent être comparés pour détecter les régressions.
+
+Exemples (depuis la racine du projet) :
+    python -m src.Exec.Timing --agents 2 3 --items-per-agent 1 2 --instances 100 --output timing.json
+    python -m src.Exec.Timing --compare reference.json timing.json --threshold 0.1
+"""
+
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from src.Problem import *
+from src.ProblemSet import *
+from src.Sequence import *
+from src.Algorithm import *
+
+ALGORITHMS = [BottomUpAlgorithm, TrumpAlgorithm, OriginalSequentialAlgorithm]
+ORACLES = ["is_borda_optimal", "is_borda_proportional", "is_maximum_borda_sum", "is_borda_max_min"]
+
+
+def generate_problems(nb_agents, nb_items, nb_instances, seed):
+    """
+    Génère les instances d'une taille de problème. Les préférences ne dépendent que de la graine
+    """
+    rng = random.Random(seed)
+    initial_problem = Problem(["Agent_" + str(i + 1) for i in range(nb_agents)],
+                              ["Item_" + str(j + 1) for j in range(nb_items)],
+                              initialize_agents=False)
+    problems = list()
+    for _ in range(nb_instances):
+        rankings = dict()
+        for name in initial_problem.agents:
+            ranking = list(range(nb_items))
+            rng.shuffle(ranking)
+            rankings[name] = ranking
+        problems.append(ProblemSet.build_instance(initial_problem, rankings))
+    return problems
+
+
+def get_tasks(problems, sequence):
+    """
+    Retourne les calculs mesurés : pour chaque cible, une fonction appliquée à chaque instance.
+    Les vérifications des propriétés portent sur l'allocation obtenue par BottomUpAlgorithm
+    """
+    tasks = dict()
+    for algorithm in ALGORITHMS:
+        tasks[algorithm.__name__] = (problems, lambda problem, algorithm=algorithm:
+                                     algorithm(problem).compute(sequence, False))
+
+    allocated = list()
+    for problem in problems:
+        algo = BottomUpAlgorithm(problem)
+        algo.compute(sequence, False)
+        allocated.append(algo.problem)
+    for oracle in ORACLES:
+        tasks["Problem." + oracle] = (allocated, lambda problem, oracle=oracle: getattr(problem, oracle)())
+    return tasks
+
+
+def measure(task, problems, repeat):
+    """
+    Retourne le temps de calcul (secondes) de chaque instance, le meilleur de repeat exécutions,
+    puis le pic mémoire (octets) d'un passage sur toutes les instances.
+    Les optima de Borda, partagés par les copies d'un problème, sont effacés avant chaque exécution :
+    chaque mesure inclut leur calcul
+    """
+    durations = list()
+    for problem in problems:
+        best = None
+        for _ in range(repeat):
+            problem.borda_optima.clear()
+            start = time.perf_counter()
+            task(problem)
+            duration = time.perf_counter() - start
+            if best is None or duration < best:
+                best = duration
+        durations.append(best)
+
+    # Le suivi des allocations ralentit les calculs : la mémoire est mesurée lors d'un passage séparé
+    tracemalloc.start()
+    for problem in problems:
+        problem.borda_optima.clear()
+        task(problem)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return durations, peak
+
+
+def run(args):
+    results = list()
+    for nb_agents in args.agents:
+        for items_per_agent in args.items_per_agent:
+            nb_items = nb_agents * items_per_agent
+            seed = args.seed * 1000003 + nb_agents * 1009 + nb_items
+            problems = generate_problems(nb_agents, nb_items, args.instances, seed)
+            sequence = Sequence.generate(problems[0], SequenceType[args.sequence])
+            for target, (instances, task) in get_tasks(problems, sequence).items():
+                if args.only and not any(name in target for name in args.only):
+                    continue
+                durations, peak = measure(task, instances, args.repeat)
+                total = sum(durations)
+                result = {"agents": nb_agents,
+                          "items": nb_items,
+                          "target": target,
+                          "instances": len(durations),
+                          "median": float(np.median(durations)),
+                          "p95": float(np.percentile(durations, 95)),
+                          "instances_per_second": len(durations) / total if total else math.inf,
+                          "peak_memory": peak}
+                results.append(result)
+                print("{agents} agents x {items} items | {target:<34} | median {median:.6f} s | "
+                      "p95 {p95:.6f} s | {instances_per_second:.1f} inst/s | peak {peak_memory} B".format(**result))
+
+    report = {"metadata": {"seed": args.seed,
+                           "instances": args.instances,
+                           "repeat": args.repeat,
+                           "sequence": args.sequence,
+                           "python": platform.python_version(),
+                           "machine": platform.machine()},
+              "results": results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    return report
+
+
+def compare(reference_path, current_path, threshold):
+    """
+    Compare les médianes de deux fichiers de mesures. Retourne le nombre de régressions
+    (médiane plus lente de plus de threshold, en proportion)
+    """
+    with open(reference_path) as file:
+        reference = {(x["agents"], x["items"], x["target"]): x for x in json.load(file)["results"]}
+    with open(current_path) as file:
+        current = {(x["agents"], x["items"], x["target"]): x for x in json.load(file)["results"]}
+
+    regressions = 0
+    for key in sorted(set(reference) & set(current)):
+        before = reference[key]["median"]
+        after = current[key]["median"]
+        ratio = after / before if before else math.inf
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "REGRESSION"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = "improvement"
+        print("{} agents x {} items | {:<34} | {:.6f} s -> {:.6f} s | x{:.2f} {}".format(*key, before, after, ratio,
+                                                                                         flag))
+    for key in sorted(set(reference) ^ set(current)):
+        print("{} agents x {} items | {:<34} | only in one file".format(*key))
+    print("... " + str(regressions) + " regression(s)")
+    return regressions
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(description="Benchmark de performance des algorithmes et des propriétés de Borda")
+    parser.add_argument("--agents", type=int, nargs="+", default=[2, 3], help="Nombres d'agents")
+    parser.add_argument("--items-per-agent", type=int, nargs="+", default=[1, 2, 3], help="Nombres d'items par agent")
+    parser.add_argument("--instances", type=int, default=50, help="Nombre d'instances par taille de problème")
+    parser.add_argument("--repeat", type=int, default=3, help="Exécutions par instance (le meilleur temps est gardé)")
+    parser.add_argument("--seed", type=int, default=0, help="Graine de génération des instances")
+    parser.add_argument("--sequence", choices=[x.name for x in SequenceType], default=SequenceType.ROUND_ROBIN.name)
+    parser.add_argument("--only", nargs="+", help="Ne mesure que les cibles dont le nom contient l'un de ces mots")
+    parser.add_argument("--output", help="Fichier JSON des mesures")
+    parser.add_argument("--compare", nargs=2, metavar=("REFERENCE", "CURRENT"),
+                        help="Compare deux fichiers de mesures au lieu de mesurer")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Ralentissement relatif de la médiane au-delà duquel une régression est signalée")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments(sys.argv[1:])
+    if arguments.compare:
+        sys.exit(1 if compare(arguments.compare[0], arguments.compare[1], arguments.threshold) else 0)
+    run(arguments)
@@ -0,0 +1,75 @@
+# coding: utf8
+
+import time
+from contextlib import contextmanager
+
+
+class Metrics(object):
+    """
+    Mesures d'exécution : durée cumulée de chaque phase (secondes) et compteurs d'opérations.
+
+    Rien n'est mesuré sans objet Metrics : les algorithmes et les problèmes ne vérifient sa présence
+    qu'une fois par phase, et les compteurs ne sont branchés (instrument) que sur les objets mesurés
+    """
+
+    def __init__(self):
+        self.timers = dict()        # Phase -> durée cumulée
+        self.counters = dict()      # Opération -> nombre d'appels
+        self.instances = 0          # Nombre d'instances mesurées
+
+    def __str__(self):
+        s = "| Instances : " + str(self.instances) + "\n"
+        for name, duration in self.timers.items():
+            s += "| " + name.ljust(32) + " : " + str(round(duration, 6)) + " s"
+            if self.instances:
+                s += " (" + str(round(duration * 1e6 / self.instances, 2)) + " µs / instance)"
+            s += "\n"
+        for name, number in self.counters.items():
+            s += "| " + name.ljust(32) + " : " + str(number)
+            if self.instances:
+                s += " (" + str(round(number / self.instances, 2)) + " / instance)"
+            s += "\n"
+        return s
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] = self.timers.get(name, 0) + time.perf_counter() - start
+
+    def count(self, name, number=1):
+        self.counters[name] = self.counters.get(name, 0) + number
+
+    def counting(self, name, function):
+        """
+        Retourne la fonction, qui compte désormais ses appels
+        """
+        counters = self.counters
+
+        def counted(*args):
+            counters[name] = counters.get(name, 0) + 1
+            return function(*args)
+        return counted
+
+    def instrument(self, problem):
+        """
+        Branche les compteurs sur un problème et ses agents (seulement eux : les autres objets ne sont pas ralentis)
+        """
+        problem.metrics = self
+        problem.allocate = self.counting("Problem.allocate", problem.allocate)
+        problem.unallocate = self.counting("Problem.unallocate", problem.unallocate)
+        for agent in problem.agents.values():
+            agent.evaluate = self.counting("Agent.evaluate", agent.evaluate)
+            agent.evaluate_bundle = self.counting("Agent.evaluate_bundle", agent.evaluate_bundle)
+
+    def merge(self, other):
+        """
+        Ajoute les mesures d'un autre objet Metrics (par exemple celles d'un processus de calcul)
+        """
+        for name, duration in other.timers.items():
+            self.timers[name] = self.timers.get(name, 0) + duration
+        for name, number in other.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + number
+        self.instances += other.instances
@@ -1,9 +1,10 @@
 # coding: utf8
 
 from src.Agent import *
+from src.Utility import iter_bits
+from src.BordaOracle import BordaOracle
 from enum import Enum
 
-import itertools
 import math
 
 
@@ -19,15 +20,27 @@ class BordaProperty(Enum):
 
 
 class Problem(object):
+    """
+    Les items sont désignés par leur indice dans self.items (la liste de leurs noms),
+    et un lot d'items est un masque de bits (le bit i correspond à l'item i)
+    """
 
     def __init__(self, agents_name, items, name="", initialize_agents=True):
         assert (len(items) % len(agents_name) == 0), "Number of items must be a multiple of the number of agents"
 
-        if not name:
+        if name:
+            self.name = name
+        else:
             self.name = "Agents_" + str(len(agents_name)) + "_Items_" + str(len(items))
         self.agents = dict()
-        self.items = items
+        self.items = list(items)            # Noms des items, utilisés seulement pour l'affichage
+        self.full_bundle = (1 << len(self.items)) - 1
         self.borda_properties = dict()
+        self.unallocated_items = self.full_bundle   # Items non alloués, tenus à jour à chaque allocation
+        self.bundle_sizes = dict()          # Taille d'allocation -> noms des agents ayant cette taille
+        self.cache = None                   # Cache persistant des résultats des oracles (ResultCache)
+        self.metrics = None                 # Mesures d'exécution (Metrics), None si elles sont désactivées
+        self.borda_optima = dict()          # Oracle -> (optimum, allocation témoin), partagé avec les copies
 
         for borda_property in self.borda_properties:
             self.borda_properties[borda_property] = None
@@ -39,6 +52,8 @@ class Problem(object):
             for name in agents_name:
                 self.agents[name] = None
 
+        self.update_allocation_state()
+
     def __str__(self):
         s = "|-=-=-=-=-=-=-=-=-= [ Problem ]-=-=-=-=-=-=-=-=-=|\n"
         s += "|\n"
@@ -55,6 +70,18 @@ class Problem(object):
         s += "|-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=|\n"
         return s
 
+    def copy(self):
+        """
+        Retourne une copie du problème prête à être résolue : les préférences des agents et les items
+        sont partagés avec l'original, seule l'allocation (et les propriétés calculées) est propre à la copie
+        """
+        problem = Problem(self.agents.keys(), self.items, self.name, initialize_agents=False)
+        problem.force_agents({name: agent.copy() for name, agent in self.agents.items()})
+        problem.cache = self.cache
+        # Les optima de Borda ne dépendent que des préférences : chaque copie profite de ceux déjà calculés
+        problem.borda_optima = self.borda_optima
+        return problem
+
     def number_of_items(self):
         return len(self.items)
 
@@ -67,13 +94,41 @@ class Problem(object):
 
     def force_agents(self, agents):
         self.agents = agents
+        self.borda_optima = dict()
+        self.update_allocation_state()
+
+    def update_allocation_state(self):
+        """
+        Recalcule les items non alloués et les tailles d'allocation à partir des items de chaque agent
+        """
+        self.unallocated_items = self.full_bundle
+        self.bundle_sizes = dict()
+        for name, agent in self.agents.items():
+            if agent is None:
+                continue
+            self.unallocated_items &= ~agent.bundle
+            self.bundle_sizes.setdefault(agent.size, set()).add(name)
+
+    def resize_bundle(self, agent_name, old_size, new_size):
+        """
+        Déplace l'agent d'une taille d'allocation à une autre
+        """
+        agents_name = self.bundle_sizes[old_size]
+        agents_name.discard(agent_name)
+        if not agents_name:
+            del self.bundle_sizes[old_size]
+        self.bundle_sizes.setdefault(new_size, set()).add(agent_name)
 
     def allocate(self, item, agent_name):
         """
         Donne l'item spécifié à l'agent spécifié
         """
         agent = self.agents[agent_name]
+        size = agent.size
         agent.give_item(item)
+        self.unallocated_items &= ~(1 << item)
+        if agent.size != size:
+            self.resize_bundle(agent_name, size, size + 1)
         return
 
     def unallocate(self, item, agent_name):
@@ -81,8 +136,10 @@ class Problem(object):
         Enlève l'item spécifié à l'agent spécifié
         """
         agent = self.agents[agent_name]
+        size = agent.size
         agent.drop_item(item)
-        print("... Removing item", item, "from", agent_name)
+        self.unallocated_items |= 1 << item
+        self.resize_bundle(agent_name, size, size - 1)
         return
 
     def transfer(self, agent_name_giver, item, agent_name_receiver):
@@ -91,9 +148,19 @@ class Problem(object):
         """
         agent_giver = self.agents[agent_name_giver]
         agent_receiver = self.agents[agent_name_receiver]
+        if agent_name_giver == agent_name_receiver:
+            # L'agent garde l'item : seule sa possession est vérifiée
+            if not agent_giver.bundle >> item & 1:
+                raise KeyError(item)
+            return
+        giver_size = agent_giver.size
+        receiver_size = agent_receiver.size
         agent_giver.drop_item(item)
         agent_receiver.give_item(item)
-        print("... Transfering item", item, "from", agent_name_giver, "to", agent_name_receiver)
+        self.resize_bundle(agent_name_giver, giver_size, giver_size - 1)
+        # Si le receveur possédait déjà l'item, sa taille est inchangée. Dans tous les cas, l'item reste alloué
+        if agent_receiver.size != receiver_size:
+            self.resize_bundle(agent_name_receiver, receiver_size, receiver_size + 1)
         return
 
     def max_utility_from(self, item, agents_name_set):
@@ -122,11 +189,9 @@ class Problem(object):
         """
         Retourne la taille de l'allocation la plus grande
         """
-        max_size = 0
-        for name, agent in self.agents.items():
-            if len(agent.items) > max_size:
-                max_size = len(agent.items)
-        return max_size
+        if not self.bundle_sizes:
+            return 0
+        return max(self.bundle_sizes)
 
     def get_eligible_agents(self):
         """
@@ -134,9 +199,9 @@ class Problem(object):
         """
         eligible_agents = set()
         max_size = self.get_max_alloc_size()
-        for name, agent in self.agents.items():
-            if len(agent.items) < max_size:
-                eligible_agents.add(name)
+        for size, agents_name in self.bundle_sizes.items():
+            if size < max_size:
+                eligible_agents |= agents_name
 
         # They all have the same number of items
         if len(eligible_agents) == 0:
@@ -170,26 +235,34 @@ class Problem(object):
         """
         Retourne les items qui ont été alloués
         """
-        allocated_items = set()
-
-        for agent in self.agents.values():
-            for item in agent.items:
-                allocated_items.add(item)
-
-        return allocated_items
+        return self.full_bundle & ~self.unallocated_items
 
     def get_unallocated_items(self):
         """
         Retourne les items qui n'ont pas été alloués
         """
-        return self.items - self.get_allocated_items()
+        return self.unallocated_items
+
+    def get_items_name(self, bundle):
+        """
+        Retourne les noms des items d'un lot
+        """
+        return set(self.items[item] for item in iter_bits(bundle))
+
+    def get_scores_matrix(self):
+        """
+        Retourne les noms des agents et la matrice des scores de Borda (agent x item)
+        """
+        agents_name = list(self.agents.keys())
+        scores = [self.agents[name].scores for name in agents_name]
+        return agents_name, scores
 
     def get_items_per_agent(self):
         return math.floor(len(self.items) / len(self.agents))
 
     @staticmethod
     def get_other_items(ref, items):
-        return set(ref) - set(items)
+        return ref & ~items
 
     "=========================================="
     "=============== Efficiency ==============="
@@ -199,40 +272,56 @@ class Problem(object):
         """
         Retourne vrai si la propriété de complétude est vérifié
         """
-        return len(self.get_unallocated_items()) == 0
+        return self.unallocated_items == 0
 
     "================================================"
     "=============== Borda properties ==============="
     "================================================"
 
-    def is_borda_optimal(self):
+    def is_borda_optimal(self, bundle_values=None):
         """
         Retourne vrai si chaque allocation de chaque agent est meilleure ou égale
         que si chacun possédait les autres allocations des autres agents.
         De plus, un agent doit évaluer que son allocation est strictment meilleure
         que celle d'un autre au moins une fois
+        :param bundle_values: Valeurs des lots (voir get_bundle_values), calculées si elles ne sont pas données
         """
-        at_least_one_greater = False
-        for name, agent in self.agents.items():
-            other_agents = self.get_other_agents(set(name))
-            for other_name in other_agents:
-                other_agent = self.agents[other_name]
-                u = agent.utility()
-                o_u = agent.evaluate_bundle(other_agent.items)
-                diff = u - o_u
-                if diff < 0:
-                    return False, \
-                           name + " prefers " + other_name + "'s allocation : " + str(other_agent.items) + " | " \
-                           + str(u) + " vs " + str(o_u)
-                elif diff > 0:
-                    at_least_one_greater = True
-        if at_least_one_greater:
+        agents_name, values = bundle_values or self.get_bundle_values()
+        envy = self.get_envy(agents_name, values)
+        if envy is not None:
+            return envy
+        if any(value < row[index] for index, row in enumerate(values) for value in row):
             return True, \
                    "For each agent, his allocation is greater or equal to other agent's allocations"
         else:
             return False, \
                    "For each agent, his allocation is equal to other agent's allocations"
 
+    def get_bundle_values(self):
+        """
+        Retourne les noms des agents et la matrice (agent x agent, listes) de la valeur du lot de l'agent j
+        pour l'agent i, lue directement dans les scores de Borda de l'agent i
+        """
+        agents_name, scores = self.get_scores_matrix()
+        bundles = [list(iter_bits(self.agents[name].bundle)) for name in agents_name]
+        return agents_name, [[sum([row[item] for item in bundle]) for bundle in bundles] for row in scores]
+
+    def get_envy(self, agents_name, values):
+        """
+        Retourne le résultat (faux et message) du premier agent préférant le lot d'un autre agent,
+        ou None si aucun agent n'envie un autre
+        """
+        for index, row in enumerate(values):
+            u = row[index]
+            for other_index, o_u in enumerate(row):
+                if o_u > u:
+                    name = agents_name[index]
+                    other_name = agents_name[other_index]
+                    return False, \
+                           name + " prefers " + other_name + "'s allocation : " \
+                           + str(self.agents[other_name].get_items_name()) + " | " + str(u) + " vs " + str(o_u)
+        return None
+
     def is_maximum_borda_sum(self):
         """
         Retourne vrai si la somme des scores de Borda des agents actuels
@@ -243,101 +332,104 @@ class Problem(object):
         for name, agent in self.agents.items():
             current_sum += agent.utility()
 
-        # II./ Get all possible allocations
-        sum_list = list()
-        self.recursive_borda_sum(sum_list,
-                                 0,
-                                 list(self.items),
-                                 list(self.agents.keys()))
-        max_sum = max(sum_list)
+        # II./ Get the maximum sum among all possible allocations
+        max_sum, _ = self.get_max_borda_sum()
         return current_sum == max_sum, "Current sum (" + str(current_sum) + ") | Max sum (" + str(max_sum) + ")"
 
-    def recursive_borda_sum(self, sum_list, current_sum, items, remaining_agents):
-        all_alloc = [list(x) for x in itertools.combinations(items, self.get_items_per_agent())]
-        agent_name = remaining_agents.pop()
-        agent = self.agents[agent_name]
-        for alloc in all_alloc:
-            remaining_items = self.get_other_items(items, alloc)
-            if remaining_agents:
-                self.recursive_borda_sum(sum_list,
-                                         current_sum + agent.evaluate_bundle(alloc),
-                                         remaining_items,
-                                         remaining_agents[:])
-            else:
-                sum_list.append(current_sum + agent.evaluate_bundle(alloc))
-        return
+    def get_max_borda_sum(self):
+        """
+        Retourne la somme maximale des scores de Borda parmi toutes les allocations possibles,
+        ainsi qu'une allocation atteignant ce maximum (nom de l'agent -> lot d'items)
+        """
+        return self.solve_borda_oracle("max_borda_sum", BordaOracle.max_borda_sum)
 
-    def is_borda_proportional(self):
+    def solve_borda_oracle(self, oracle, solve):
+        """
+        Résout un oracle de Borda sur les préférences du problème. Chaque oracle n'est résolu qu'une fois
+        pour le problème et toutes ses copies, et seulement s'il n'est pas dans le cache (s'il y en a un)
+        """
+        if oracle in self.borda_optima:
+            if self.metrics is not None:
+                self.metrics.count("Problem.borda_optima_reused")
+            return self.borda_optima[oracle]
+
+        if self.cache is not None:
+            cached = self.cache.get_oracle(self, oracle, BordaOracle.VERSION)
+            if cached is not None:
+                self.borda_optima[oracle] = cached
+                return cached
+
+        agents_name, scores = self.get_scores_matrix()
+        value, bundles = solve(scores, self.get_items_per_agent(), self.metrics)
+        allocation = dict()
+        for index, bundle in enumerate(bundles):
+            allocation[agents_name[index]] = sum(1 << item for item in bundle)
+
+        if self.cache is not None:
+            self.cache.put_oracle(self, oracle, BordaOracle.VERSION, value, allocation)
+        self.borda_optima[oracle] = value, allocation
+        return value, allocation
+
+    def is_borda_proportional(self, bundle_values=None):
         """
         Retourne vrai si chaque agent a un score de Borda au moins égal à tous les autres agents
+        :param bundle_values: Valeurs des lots (voir get_bundle_values), calculées si elles ne sont pas données
         """
-        for name, agent in self.agents.items():
-            other_agents = self.get_other_agents(set(name))
-            for other_name in other_agents:
-                other_agent = self.agents[other_name]
-                u = agent.utility()
-                o_u = agent.evaluate_bundle(other_agent.items)
-                if u - o_u < 0:
-                    return False, \
-                           name + " prefers " + other_name + "'s allocation : " + str(other_agent.items) + " | " \
-                           + str(u) + " vs " + str(o_u)
+        envy = self.get_envy(*(bundle_values or self.get_bundle_values()))
+        if envy is not None:
+            return envy
         return True, "For each agent, his allocation is at least equal to other agent's allocations"
 
     def is_borda_max_min(self):
         """
-        itertools.combinaison()
         Retourne vrai si le min des scores de borda est égal au max min des scores de Borda
         des agents selon toutes les allocations possibles
         """
 
         # I./ Compute current minimum
-        min_score = None
-        for name, agent in self.agents.items():
-            value = agent.utility()
-            if not min_score or value < min_score:
-                min_score = value
-
-        # II./ Compute current minimum
-        score_list = list()
-        self.recursive_borda_max_min(score_list,
-                                     list(),
-                                     list(self.items),
-                                     list(self.agents.keys()))
-
-        # III./ Compute min for each possible allocations
-        min_score_list = list()
-        for round_score in score_list:
-            min_score_list.append(min(round_score))
-
-        max_min_score = max(min_score_list)
-        return min_score == max(min_score_list), \
+        min_score = min(agent.utility() for agent in self.agents.values())
+
+        # II./ Compute maximum minimum among all possible allocations
+        max_min_score, _ = self.get_borda_max_min()
+        return min_score == max_min_score, \
                "Minimum score (" + str(min_score) + ") | Max min score (" + str(max_min_score) + ")"
 
-    def recursive_borda_max_min(self, score_list, current_score, items, remaining_agents):
-        all_alloc = [list(x) for x in itertools.combinations(items, self.get_items_per_agent())]
-        agent_name = remaining_agents.pop()
-        agent = self.agents[agent_name]
-        for alloc in all_alloc:
-            remaining_items = self.get_other_items(items, alloc)
-            _current_score = current_score[:]
-            _current_score.append(agent.evaluate_bundle(alloc))
-            if remaining_agents:
-                self.recursive_borda_max_min(score_list,
-                                             _current_score,
-                                             remaining_items,
-                                             remaining_agents[:])
-            else:
-                score_list.append(_current_score)
-        return
+    def get_borda_max_min(self):
+        """
+        Retourne le max min des scores de Borda parmi toutes les allocations possibles,
+        ainsi qu'une allocation atteignant ce max min (nom de l'agent -> lot d'items)
+        """
+        return self.solve_borda_oracle("max_borda_max_min", BordaOracle.max_borda_max_min)
 
     def compute_borda_properties(self):
         """
         Détermine si le problème vérifie chaque propriété de Borda
         :return:
         """
-        self.borda_properties[BordaProperty.BE] = self.is_borda_proportional()
-        self.borda_properties[BordaProperty.BP] = self.is_borda_optimal()
+        if self.metrics is not None:
+            return self.compute_borda_properties_measured()
+
+        # Les deux vérifications d'envie lisent la même matrice des valeurs des lots
+        bundle_values = self.get_bundle_values()
+        self.borda_properties[BordaProperty.BE] = self.is_borda_proportional(bundle_values)
+        self.borda_properties[BordaProperty.BP] = self.is_borda_optimal(bundle_values)
         self.borda_properties[BordaProperty.BS] = self.is_maximum_borda_sum()
         self.borda_properties[BordaProperty.BM] = self.is_borda_max_min()
 
         return self.borda_properties
+
+    def compute_borda_properties_measured(self):
+        """
+        Comme compute_borda_properties, en mesurant la durée de la vérification de chaque propriété
+        """
+        with self.metrics.timer("Bundle values"):
+            bundle_values = self.get_bundle_values()
+        checks = [(BordaProperty.BE, lambda: self.is_borda_proportional(bundle_values)),
+                  (BordaProperty.BP, lambda: self.is_borda_optimal(bundle_values)),
+                  (BordaProperty.BS, self.is_maximum_borda_sum),
+                  (BordaProperty.BM, self.is_borda_max_min)]
+        for borda_property, check in checks:
+            with self.metrics.timer("Property " + borda_property.name):
+                self.borda_properties[borda_property] = check()
+
+        return self.borda_properties
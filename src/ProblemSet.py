@@ -1,10 +1,23 @@
+import itertools
+import json
+import os
 import random
 import math
+import shutil
 import time
+from collections import deque
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import matplotlib.pyplot as plt
 from src.Problem import *
+from src.BordaOracle import BordaOracle
+from src.Metrics import Metrics
+from src.ProfileBatch import ProfileBatch
+from src.ProfileFile import ProfileFile
+from src.ResultStore import ResultStore
 from src.Sequence import *
+from src.Utility import iter_bits, rank_permutation, unrank_permutation, next_permutation
 
 
 class ProblemSet(object):
@@ -13,93 +26,671 @@ class ProblemSet(object):
     des changements au niveau des préférences des agents. Au plus N! instances possibles (N = nombre d'items)
     """
 
-    def __init__(self, initial_problem, algorithms, limit=math.inf, path="./"):
+    NO_INSTANCE_ID = -1     # Identifiant enregistré pour les instances tirées au hasard (voir sample)
+
+    def __init__(self, initial_problem, algorithms, limit=math.inf, path="./", symmetric_agents=None, cache=None,
+                 instrument=False, profile_file=None, first_instance=0):
+        """
+        :param first_instance: Identifiant de la première instance générée (voir get_profile). Un parcours exhaustif
+        peut ainsi être découpé en plages indépendantes (first_instance, limit), sur plusieurs processus ou machines
+        :param profile_file: Préférences enregistrées (ProfileFile, voir save_profiles) : les instances sont lues
+        dans ce fichier au lieu d'être générées. Ses agents (dans le même ordre) et ses items doivent être ceux
+        du problème initial. Une plage du fichier se choisit avec ProfileFile.select, et non avec first_instance
+        :param instrument: Mesure, pour chaque algorithme, la durée de chaque phase du calcul et compte les opérations
+        (voir Metrics). Les mesures sont affichées à la fin du benchmark
+        :param cache: Cache persistant (ResultCache) des résultats des algorithmes et des oracles de Borda.
+        Seules les instances résolues une à une l'utilisent (pas les calculs vectorisés)
+        :param symmetric_agents: Agents interchangeables. Les instances qui ne diffèrent que par une permutation
+        de ces agents (et un renommage des items) forment une classe : elles sont générées à la suite (voir
+        expand_orbits), et les optima de Borda, qui n'en dépendent pas, ne sont calculés qu'une fois par classe.
+        Chaque instance reste résolue par les algorithmes (la séquence et les départages entre agents brisent
+        la symétrie) : les résultats sont ceux du parcours exhaustif. Seulement sans limite ni première instance
+        """
         self.initial_problem = initial_problem
-        self.problems = list()  # Set of problems to test
         self.algorithms = algorithms
-        self.results = dict()
+        self.limit = limit
+        self.symmetric_agents = set(symmetric_agents) if symmetric_agents else set()
+        if len(self.symmetric_agents) >= 2 and profile_file is None:
+            if limit != math.inf or first_instance:
+                # Les instances sont générées par classe et non dans l'ordre des identifiants : une plage
+                # du flux ne serait pas une plage d'identifiants
+                raise ValueError("Symmetric agents require an exhaustive enumeration (no limit nor first instance)")
+        if profile_file is not None:
+            if first_instance:
+                raise ValueError("first_instance does not apply to a profile file (use ProfileFile.select)")
+            if profile_file.agents_name != list(initial_problem.agents):
+                raise ValueError("The profile file was written for agents " + str(profile_file.agents_name)
+                                 + ", not " + str(list(initial_problem.agents)))
+            if sorted(profile_file.items) != sorted(initial_problem.items):
+                raise ValueError("The profile file was written for other items : " + str(profile_file.items))
+        self.cache = cache
+        self.profile_file = profile_file
+        self.first_instance = first_instance
+        self.metrics = {x: Metrics() for x in algorithms} if instrument else None
+        self.nb_instances = self.count_instances()
+        self.results = ResultStore([x.__name__ for x in algorithms], agents_name=self.get_profile_agents())
         self.sequence = None
         self.path = path
+        self.checkpoint = None           # Dossier de reprise (voir run)
+        self.checkpoint_interval = 60
+        self.last_checkpoint = 0
+        self.checkpoint_size = None     # Nombre d'instances de la dernière sauvegarde de cette exécution
 
-        # Create a container to store all borda properties per algorithm
-        for algorithm in algorithms:
-            borda_properties = dict()
-            for borda_property in BordaProperty:
-                borda_properties[borda_property] = list()
-            self.results[algorithm] = borda_properties
-
-        self.generate_instances(limit)
+        n = self.initial_problem.number_of_items()
+        print("... number of possible permutations for preferences :", math.factorial(n))
 
-    def generate_instances(self, limit):
+    def count_instances(self):
         """
-        :param number: Par défaut, génére le nombre maximal d'instances possibles, sinon la valeur spécifiée
+        Retourne le nombre d'instances générées : (N!)^(M-1) au plus (N = nombre d'items, M = nombre d'agents)
         """
+        if self.profile_file is not None:
+            return min(len(self.profile_file), self.limit)
         n = self.initial_problem.number_of_items()
-        print("... number of possible permutations for preferences :", math.factorial(n))
-        print("... generating permutations")
-        all_rankings = [list(x) for x in itertools.islice(itertools.permutations(self.initial_problem.items, n), limit)]
+        nb_instances = math.factorial(n) ** (self.initial_problem.number_of_agents() - 1)
+        return min(max(0, nb_instances - self.first_instance), self.limit)
+
+    def generate_instances(self):
+        """
+        Génère les instances une à une, à la demande. Aucune instance n'est conservée :
+        la mémoire utilisée ne dépend pas du nombre d'instances
+        """
+        for rankings, _ in self.generate_profiles():
+            yield self.build_instance(self.initial_problem, rankings)
+
+    def generate_profiles(self, skip=0):
+        """
+        Génère les préférences (nom de l'agent -> classement des items) de chaque instance,
+        avec sa multiplicité (1 pour les instances générées, voir ProfileFile pour celles d'un fichier)
+        :param skip: Nombre d'instances générées à sauter (déjà résolues, voir load_checkpoint)
+        """
+        if self.profile_file is not None:
+            return self.profile_file.select(skip, self.nb_instances).generate_profiles()
+
+        if len(self.symmetric_agents) < 2:
+            all_rankings = self.generate_rankings(self.first_instance + skip, max(0, self.nb_instances - skip))
+            return ((rankings, 1) for rankings in all_rankings)
+        # Les instances d'une classe ne se suivent pas dans le parcours exhaustif : il est parcouru en entier
+        all_rankings = self.generate_rankings(self.first_instance, self.nb_instances)
+        return itertools.islice(self.expand_orbits(all_rankings), skip, None)
 
-        print("... generating instances")
+    def get_profile_agents(self):
+        """
+        Retourne les agents dans l'ordre des préférences générées (le premier a des préférences fixées).
+        C'est l'ordre du problème initial : il ne dépend pas de l'interpréteur, et les identifiants d'instances
+        (voir get_instance_id) désignent les mêmes préférences d'un processus ou d'une machine à l'autre
+        """
+        return list(self.initial_problem.agents)
+
+    def generate_random_profiles(self, rng):
+        """
+        Génère indéfiniment des préférences tirées uniformément au hasard
+        """
+        agents_name = self.get_profile_agents()
+        items = list(range(self.initial_problem.number_of_items()))
+        while True:
+            rankings = dict()
+            for name in agents_name:
+                ranking = items[:]
+                rng.shuffle(ranking)
+                rankings[name] = ranking
+            yield rankings
 
-        rankings_per_agent = dict()
-        # La préférence du premier agent n'est pas importante
-        agents_name = list(self.initial_problem.get_agents_name())
-        rankings_per_agent[agents_name.pop()] = all_rankings[0]
-        self.recursive_generate_instances(all_rankings, rankings_per_agent, agents_name, limit)
+    def expand_orbits(self, all_rankings):
+        """
+        Génère les instances classe par classe : à chaque représentant canonique (la plus petite instance de sa
+        classe) du parcours exhaustif, toutes les instances équivalentes par permutation des agents interchangeables,
+        en commençant par le représentant. Chaque instance est ainsi générée une fois
+        """
+        agents_name = self.get_profile_agents()
+        for rankings in all_rankings:
+            equivalent_profiles = {profile for profile, _, _ in
+                                   self.get_equivalent_profiles(rankings, self.symmetric_agents)}
+            if tuple(tuple(rankings[name]) for name in agents_name[1:]) != min(equivalent_profiles):
+                continue
+            for profile in sorted(equivalent_profiles):
+                yield dict(zip(agents_name, (rankings[agents_name[0]],) + profile)), 1
 
-        return
+    @staticmethod
+    def get_equivalent_profiles(rankings, symmetric_agents):
+        """
+        Génère, pour chaque permutation des agents interchangeables, les préférences équivalentes (classements des
+        agents hors premier, en tuples), la permutation (l'agent prend les préférences de permutation[agent]) et le
+        renommage des items (l'item i devient l'item relabel[i]).
 
-    def recursive_generate_instances(self, all_rankings, current_rankings, remaining_agents, limit):
-        agent_name = remaining_agents.pop()
-        for ranking in all_rankings:
-            if len(self.problems) >= limit:
+        Les préférences du premier agent sont l'identité : chaque permutation des agents est suivie du renommage
+        des items qui ramène ses préférences à l'identité
+        """
+        agents_name = list(rankings.keys())
+        symmetric = [name for name in agents_name if name in symmetric_agents]
+        for symmetric_permutation in itertools.permutations(symmetric):
+            permutation = {name: name for name in agents_name}
+            permutation.update(zip(symmetric, symmetric_permutation))
+            relabel = [0] * len(rankings[agents_name[0]])
+            for index, item in enumerate(rankings[permutation[agents_name[0]]]):
+                relabel[item] = index
+            yield (tuple(tuple(relabel[item] for item in rankings[permutation[name]]) for name in agents_name[1:]),
+                   permutation, relabel)
+
+    def generate_batches(self, batch_size, skip=0):
+        """
+        Génère les instances par lots (ProfileBatch) d'au plus batch_size instances
+        """
+        if self.profile_file is not None:
+            for start in range(skip, self.nb_instances, batch_size):
+                yield self.profile_file.select(start, min(start + batch_size, self.nb_instances)).get_batch()
+            return
+
+        profiles = self.generate_profiles(skip)
+        while True:
+            chunk = list(itertools.islice(profiles, batch_size))
+            if not chunk:
                 return
+            rankings, weights = zip(*chunk)
+            yield ProfileBatch.from_profiles(self.initial_problem.items, rankings, weights)
+
+    def generate_rankings(self, first_instance, nb_instances):
+        """
+        Génère les préférences des instances d'identifiants first_instance à first_instance + nb_instances - 1.
+        Seule la première est calculée à partir de son identifiant : les suivantes s'en déduisent en passant
+        à la permutation suivante du dernier agent (avec retenue sur les agents précédents)
+        """
+        agents_name = self.get_profile_agents()
+        first_ranking = list(range(self.initial_problem.number_of_items()))
+        rankings = self.get_profile(first_instance)
+        permutations = [list(rankings[name]) for name in agents_name[1:]]
+        for _ in range(nb_instances):
+            rankings = {agents_name[0]: first_ranking}
+            for name, permutation in zip(agents_name[1:], permutations):
+                rankings[name] = tuple(permutation)
+            yield rankings
+            for permutation in reversed(permutations):
+                if next_permutation(permutation):
+                    break
+
+    def get_instance_id(self, rankings):
+        """
+        Retourne l'identifiant d'une instance : les rangs (code de Lehmer) des préférences des agents, hors premier
+        agent, forment les chiffres d'un nombre en base N! (le premier agent à préférences libres est le chiffre
+        de poids fort). C'est aussi la position de l'instance dans le parcours exhaustif
+        """
+        base = math.factorial(self.initial_problem.number_of_items())
+        instance_id = 0
+        for name in self.get_profile_agents()[1:]:
+            instance_id = instance_id * base + rank_permutation(rankings[name])
+        return instance_id
+
+    def get_stream_ids(self, chunk):
+        """
+        Retourne les identifiants des instances d'un lot du flux (liste de préférences, ProfileFile ou ProfileBatch),
+        ou None s'ils se suivent : sans agents interchangeables ni fichier de préférences, l'identifiant
+        d'une instance se déduit de sa position (voir add_results)
+        """
+        if self.profile_file is None and len(self.symmetric_agents) < 2:
+            return None
+        if isinstance(chunk, (ProfileFile, ProfileBatch)):
+            chunk = [chunk.get_rankings(index) for index in range(len(chunk))]
+        return [self.get_instance_id(rankings) for rankings in chunk]
+
+    def get_profile(self, instance_id):
+        """
+        Retourne les préférences (nom de l'agent -> classement des items) de l'instance de cet identifiant
+        """
+        n = self.initial_problem.number_of_items()
+        base = math.factorial(n)
+        agents_name = self.get_profile_agents()
+        ranks = list()
+        for _ in agents_name[1:]:
+            instance_id, rank = divmod(instance_id, base)
+            ranks.append(rank)
+        rankings = {agents_name[0]: list(range(n))}
+        for name, rank in zip(agents_name[1:], reversed(ranks)):
+            rankings[name] = tuple(unrank_permutation(rank, n))
+        return rankings
+
+    @staticmethod
+    def build_instance(initial_problem, rankings):
+        """
+        Construit le problème dont les agents ont les préférences données
+        """
+        agents = dict()
+        for name, ranking in rankings.items():
+            agents[name] = Agent(name, initial_problem, ranking)
+        problem = Problem(initial_problem.get_agents_name(),
+                          initial_problem.items,
+                          initialize_agents=False)
+        problem.force_agents(agents)
+        return problem
+
+    @staticmethod
+    def run_instance(problem, algorithms, sequence, cache=None, metrics=None):
+        """
+        Exécute chaque algorithme sur le problème (sauf si son résultat est déjà dans le cache).
+        Retourne, pour chaque algorithme, les propriétés de Borda vérifiées (ou non) par l'allocation obtenue
+        :param metrics: Si spécifié, les mesures (Metrics) de chaque algorithme, mises à jour
+        """
+        problem.cache = cache
+        results = list()
+        for index, algorithm in enumerate(algorithms):
+            algorithm_metrics = metrics[index] if metrics is not None else None
+            if cache is not None:
+                cached = cache.get_run(problem, algorithm, sequence)
+                if cached is not None:
+                    if algorithm_metrics is not None:
+                        algorithm_metrics.count("ResultCache.hits")
+                    results.append({x: cached["properties"][x.name][0] for x in BordaProperty})
+                    continue
+            algo = algorithm(problem)
+            algo.compute(sequence, False, metrics=algorithm_metrics)
+            if cache is not None:
+                cache.put_run(problem, algorithm, sequence, algo)
+            results.append({x: algo.problem.borda_properties[x][0] for x in BordaProperty})
+        return results
+
+    @staticmethod
+    def run_profile(initial_problem, algorithms, sequence, rankings, symmetric_agents=None, orbit=None, cache=None,
+                    metrics=None):
+        """
+        Comme run_instance, pour les préférences d'une instance. Avec des agents interchangeables, les optima de
+        Borda de la classe de l'instance (voir expand_orbits) sont repris s'ils sont connus, et sinon conservés
+        pour les instances suivantes de la classe. Ils ne dépendent ni de l'ordre des agents ni des noms des items :
+        seules leurs allocations témoins sont transposées (dans les préférences du représentant canonique)
+        :param orbit: Classe de la dernière instance résolue et ses optima (dictionnaire, mis à jour)
+        """
+        problem = ProblemSet.build_instance(initial_problem, rankings)
+        if symmetric_agents is None or len(symmetric_agents) < 2:
+            return ProblemSet.run_instance(problem, algorithms, sequence, cache, metrics)
+
+        # Le représentant canonique a les préférences de l'agent permutation[agent] de l'instance, items renommés
+        canonical, permutation, relabel = min(ProblemSet.get_equivalent_profiles(rankings, symmetric_agents),
+                                              key=lambda x: x[0])
+        if orbit.get("canonical") != canonical:
+            orbit.clear()
+            orbit.update(canonical=canonical, optima=dict())
+        original = [0] * len(relabel)
+        for item, canonical_item in enumerate(relabel):
+            original[canonical_item] = item
+        for oracle, (value, allocation) in orbit["optima"].items():
+            problem.borda_optima[oracle] = value, {
+                permutation[name]: sum(1 << original[item] for item in iter_bits(bundle))
+                for name, bundle in allocation.items()}
 
-            _current_rankings = dict(current_rankings)
-            _current_rankings[agent_name] = ranking
-            if remaining_agents:
-                self.recursive_generate_instances(all_rankings, _current_rankings, remaining_agents[:], limit)
-            else:
-                agents = dict()
-                for name, rankings in _current_rankings.items():
-                    agent = Agent(name, self.initial_problem)
-                    agent.set_borda_ranks(rankings)
-                    agents[name] = agent
-                problem = Problem(self.initial_problem.get_agents_name(),
-                                  self.initial_problem.items,
-                                  False)
-                problem.force_agents(agents)
-                self.problems.append(problem)
-
-    def run(self, sequence):
+        results = ProblemSet.run_instance(problem, algorithms, sequence, cache, metrics)
+        for oracle, (value, allocation) in problem.borda_optima.items():
+            orbit["optima"][oracle] = value, {
+                name: sum(1 << relabel[item] for item in iter_bits(allocation[permutation[name]]))
+                for name in allocation}
+        return results
+
+    @staticmethod
+    def run_batch(batch, algorithms, sequence, metrics=None):
+        """
+        Exécute chaque algorithme sur toutes les instances d'un lot (ProfileBatch) avec leur calcul vectorisé.
+        Retourne, pour chaque instance, le même résultat que run_instance
+        :param metrics: Si spécifié, les mesures (Metrics) de chaque algorithme, mises à jour
+        """
+        if metrics is None:
+            properties = [batch.check_properties(algorithm.compute_batch(batch, sequence)[0])
+                          for algorithm in algorithms]
+        else:
+            properties = list()
+            for algorithm, algorithm_metrics in zip(algorithms, metrics):
+                algorithm_metrics.instances += len(batch)
+                with algorithm_metrics.timer("compute_batch"):
+                    allocations = algorithm.compute_batch(batch, sequence)[0]
+                with algorithm_metrics.timer("check_properties"):
+                    properties.append(batch.check_properties(allocations))
+        return [[{x: bool(algorithm_properties[x][index]) for x in BordaProperty}
+                 for algorithm_properties in properties]
+                for index in range(len(batch))]
+
+    @staticmethod
+    def run_chunk(initial_problem, algorithms, sequence, chunk, batched=False, cache=None, metrics=None,
+                  symmetric_agents=None):
+        """
+        Exécute chaque algorithme sur un lot de préférences (utilisé par les processus de calcul).
+        Le lot est une liste de préférences, ou une plage d'instances d'un fichier de préférences (ProfileFile)
+        :param symmetric_agents: Agents interchangeables (voir run_profile)
+        """
+        if isinstance(chunk, ProfileFile):
+            if batched:
+                return ProblemSet.run_batch(chunk.get_batch(), algorithms, sequence, metrics)
+            chunk = chunk.get_profiles()
+        if batched:
+            return ProblemSet.run_batch(ProfileBatch.from_profiles(initial_problem.items, chunk), algorithms, sequence,
+                                        metrics)
+        orbit = dict()
+        results = [ProblemSet.run_profile(initial_problem, algorithms, sequence, rankings, symmetric_agents, orbit,
+                                          cache, metrics)
+                   for rankings in chunk]
+        if cache is not None:
+            cache.flush_accesses()
+        return results
+
+    @staticmethod
+    def run_measured_chunk(initial_problem, algorithms, sequence, chunk, batched=False, cache=None,
+                           symmetric_agents=None):
+        """
+        Comme run_chunk, en mesurant chaque algorithme. Retourne les résultats et les mesures
+        (un processus de calcul ne peut pas modifier celles du processus principal)
+        """
+        metrics = [Metrics() for _ in algorithms]
+        return ProblemSet.run_chunk(initial_problem, algorithms, sequence, chunk, batched, cache, metrics,
+                                    symmetric_agents), metrics
+
+    def get_metrics(self):
+        """
+        Retourne les mesures de chaque algorithme, dans l'ordre des algorithmes (None si elles sont désactivées)
+        """
+        if self.metrics is None:
+            return None
+        return [self.metrics[algorithm] for algorithm in self.algorithms]
+
+    def run(self, sequence, workers=1, chunk_size=None, batch_size=None, checkpoint=None, checkpoint_interval=60,
+            resume=False):
+        """
+        :param sequence: Séquence utilisée par les algorithmes
+        :param workers: Nombre de processus de calcul. Au-delà de 1, les instances sont réparties par lots
+        entre les processus et les résultats sont fusionnés dans l'ordre des instances
+        :param chunk_size: Nombre d'instances par lot (par défaut, environ 4 lots par processus, 1000 au plus)
+        :param batch_size: Si spécifié, les instances sont traitées par lots de cette taille avec les calculs
+        vectorisés des algorithmes (compute_batch). Avec plusieurs processus, chaque lot envoyé est traité ainsi
+        :param checkpoint: Dossier de reprise. Les résultats obtenus et la position dans le flux d'instances
+        y sont sauvegardés régulièrement, et à la fin du benchmark
+        :param checkpoint_interval: Durée minimale (secondes) entre deux sauvegardes du dossier de reprise
+        :param resume: Reprend à partir de la dernière sauvegarde du dossier de reprise (s'il y en a une) :
+        les instances déjà résolues ne sont pas recalculées, et les résultats sont identiques à ceux
+        d'une exécution sans interruption
+        """
         self.sequence = sequence
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_size = None
+        skip = self.load_checkpoint() if checkpoint is not None and resume else 0
+        self.last_checkpoint = time.perf_counter()
         print("|-=-=-=-=-=-= [ STARTING BENCHMARK ] =-=-=-=-=-=-=|")
         print(self.get_summary())
         print("|-=-=-=-=-=-=-=-=- [ BEGIN ] -=-=-=-=-=-=-=-=-=-=-|")
-        for algorithm in self.algorithms:
-            print("\n---------- Testing : " + algorithm.__name__)
-            nb_pb = len(self.problems)
-            step = nb_pb / 51
-            checkpoint = step
-            print("In progress ", end="")
-            for index, problem in enumerate(self.problems):
-                if index >= checkpoint:
-                    print(".", end="")
-                    checkpoint += step
-                algo = algorithm(problem)
-                algo.compute(sequence, False)
-                self.add_result(algorithm, algo)
-            print(" Done !")
+        print("\n---------- Testing : " + str([x.__name__ for x in self.algorithms]))
+        if skip:
+            print("... resuming after " + str(skip) + " instances")
+        print("In progress ", end="")
+        if workers > 1:
+            self.run_parallel(sequence, workers, batch_size or chunk_size, batch_size is not None, skip)
+        elif batch_size:
+            progress = self.progress()
+            next(progress)
+            progress.send(int(self.results.get_weights().sum()))
+            for batch in self.generate_batches(batch_size, skip):
+                batch_results = self.run_batch(batch, self.algorithms, sequence, self.get_metrics())
+                self.add_chunk_results(batch_results, batch.weights.tolist(), self.get_stream_ids(batch))
+                progress.send(int(batch.weights.sum()))
+                self.save_checkpoint()
+        else:
+            progress = self.progress()
+            next(progress)
+            progress.send(int(self.results.get_weights().sum()))
+            orbit = dict()
+            for rankings, weight in self.generate_profiles(skip):
+                instance_ids = self.get_stream_ids([rankings])
+                self.add_results(self.run_profile(self.initial_problem, self.algorithms, sequence, rankings,
+                                                  self.symmetric_agents, orbit, self.cache, self.get_metrics()),
+                                 weight, instance_ids[0] if instance_ids else None)
+                progress.send(weight)
+                self.save_checkpoint()
+        self.save_checkpoint(force=True)
+        if self.cache is not None:
+            self.cache.flush_accesses()
+        print(" Done !")
+        if self.metrics is not None:
+            print(self.get_metrics_summary())
+
+        print("\n|-=-=-=-=-=-=-=-=-= [ END ] =-=-=-=-=-=-=-=-=-=-=-|")
+
+    def sample(self, sequence, width=0.02, confidence=0.95, max_samples=100000, chunk_size=100, batched=False,
+               seed=None):
+        """
+        Mode échantillonnage : les instances sont tirées uniformément au hasard, et le tirage s'arrête dès que
+        l'intervalle de confiance (de Wilson) de chaque proportion (algorithme x propriété) est plus étroit que width,
+        ou après max_samples instances
+        :param confidence: Niveau de confiance des intervalles
+        :param chunk_size: Nombre d'instances tirées entre deux vérifications des intervalles
+        :param batched: Résout chaque tirage avec les calculs vectorisés des algorithmes (compute_batch)
+        :param seed: Graine du générateur aléatoire, pour reproduire un tirage
+        """
+        self.sequence = sequence
+        self.nb_instances = max_samples
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        successes = {algorithm: dict.fromkeys(BordaProperty, 0) for algorithm in self.algorithms}
+
+        print("|-=-=-=-=-=-= [ STARTING SAMPLING ] =-=-=-=-=-=-=|")
+        print(self.get_summary())
+        print("|-=-=-=-=-=-=-=-=- [ BEGIN ] -=-=-=-=-=-=-=-=-=-=-|")
+        print("\n---------- Testing : " + str([x.__name__ for x in self.algorithms]))
+        print("In progress ", end="")
+        progress = self.progress()
+        next(progress)
+        profiles = self.generate_random_profiles(random.Random(seed))
+        nb_samples = 0
+        max_width = 1
+        while nb_samples < max_samples:
+            chunk = list(itertools.islice(profiles, min(chunk_size, max_samples - nb_samples)))
+            chunk_results = self.run_chunk(self.initial_problem, self.algorithms, sequence, chunk, batched,
+                                           self.cache, self.get_metrics())
+            for instance_results in chunk_results:
+                # Les instances tirées n'ont pas de place dans le parcours exhaustif : pas d'identifiant
+                self.add_results(instance_results, instance_id=self.NO_INSTANCE_ID)
+                for algorithm, properties in zip(self.algorithms, instance_results):
+                    for borda_property, value in properties.items():
+                        successes[algorithm][borda_property] += value
+            nb_samples += len(chunk)
+            progress.send(len(chunk))
+
+            max_width = max(self.get_interval_width(value, nb_samples, z)
+                            for algorithm_successes in successes.values()
+                            for value in algorithm_successes.values())
+            if max_width <= width:
+                break
+        self.nb_instances = nb_samples
+        print(" Done !")
+        print("... " + str(nb_samples) + " samples, widest confidence interval : " + str(round(max_width, 4)))
+        if self.metrics is not None:
+            print(self.get_metrics_summary())
 
         print("\n|-=-=-=-=-=-=-=-=-= [ END ] =-=-=-=-=-=-=-=-=-=-=-|")
 
-    def add_result(self, algorithm, instance):
+    @staticmethod
+    def get_interval_width(successes, nb_samples, z):
+        """
+        Retourne la largeur de l'intervalle de confiance de Wilson d'une proportion
+        """
+        p = successes / nb_samples
+        z2 = z * z
+        return 2 * z * math.sqrt(p * (1 - p) / nb_samples + z2 / (4 * nb_samples * nb_samples)) / (1 + z2 / nb_samples)
+
+    def run_parallel(self, sequence, workers, chunk_size=None, batched=False, skip=0):
+        if chunk_size is None:
+            chunk_size = max(1, min(1000, math.ceil(self.nb_instances / (workers * 4))))
+
+        progress = self.progress()
+        next(progress)
+        progress.send(int(self.results.get_weights().sum()))
+        chunks = self.generate_chunks(chunk_size, skip)
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while True:
+                # Au plus deux lots en attente par processus : la mémoire reste bornée
+                while len(pending) < workers * 2:
+                    chunk, weights = next(chunks, (None, None))
+                    if chunk is None:
+                        break
+                    run_chunk = ProblemSet.run_chunk if self.metrics is None else ProblemSet.run_measured_chunk
+                    pending.append((executor.submit(run_chunk,
+                                                    self.initial_problem, self.algorithms, sequence, chunk,
+                                                    batched, self.cache, symmetric_agents=self.symmetric_agents),
+                                    weights, self.get_stream_ids(chunk)))
+                if not pending:
+                    break
+
+                # Les lots sont fusionnés dans l'ordre de soumission, donc dans l'ordre des instances
+                future, weights, instance_ids = pending.popleft()
+                chunk_results = future.result()
+                if self.metrics is not None:
+                    chunk_results, chunk_metrics = chunk_results
+                    for algorithm_metrics, worker_metrics in zip(self.get_metrics(), chunk_metrics):
+                        algorithm_metrics.merge(worker_metrics)
+                self.add_chunk_results(chunk_results, weights, instance_ids)
+                progress.send(sum(weights))
+                self.save_checkpoint()
+
+    def generate_chunks(self, chunk_size, skip=0):
         """
-        :param algorithm: Classe de l'algorithme testé
-        :param instance: Instance de l'algorithme testé
+        Génère les lots envoyés aux processus de calcul, avec les multiplicités de leurs instances.
+        Les instances d'un fichier de préférences ne sont pas envoyées : seulement leur plage
         """
-        for borda_property in BordaProperty:
-            self.results[algorithm][borda_property].append(instance.problem.borda_properties[borda_property][0])
+        if self.profile_file is not None:
+            for start in range(skip, self.nb_instances, chunk_size):
+                chunk = self.profile_file.select(start, min(start + chunk_size, self.nb_instances))
+                yield chunk, chunk.weights.tolist()
+            return
+
+        profiles = self.generate_profiles(skip)
+        while True:
+            chunk = list(itertools.islice(profiles, chunk_size))
+            if not chunk:
+                return
+            rankings, weights = zip(*chunk)
+            yield rankings, weights
+
+    def save_profiles(self, path):
+        """
+        Enregistre les préférences des instances (avec leur multiplicité) dans un fichier de préférences,
+        et retourne ce fichier (ProfileFile), à donner aux ensembles d'instances suivants
+        """
+        return ProfileFile.write(path, self.get_profile_agents(), self.initial_problem.items, self.generate_profiles(),
+                                 self.nb_instances)
+
+    def progress(self):
+        """
+        Affiche la progression (51 points au total). Reçoit le nombre d'instances terminées
+        """
+        step = self.nb_instances / 51
+        checkpoint = step
+        done = 0
+        while True:
+            done += yield
+            # Sans instance, il n'y a aucun point à afficher
+            while step > 0 and done >= checkpoint and checkpoint <= self.nb_instances:
+                print(".", end="", flush=True)
+                checkpoint += step
+
+    def add_results(self, instance_results, weight=1, instance_id=None):
+        """
+        :param instance_results: Pour chaque algorithme, les propriétés de Borda vérifiées par son allocation
+        :param weight: Multiplicité de l'instance
+        :param instance_id: Identifiant de l'instance (voir get_instance_id). Par défaut, celui de l'instance
+        à cette position du parcours exhaustif commençant à first_instance
+        """
+        if instance_id is None:
+            instance_id = self.first_instance + len(self.results)
+        self.results.append(instance_id, weight, instance_results)
+
+    def add_chunk_results(self, chunk_results, weights, instance_ids=None):
+        """
+        Ajoute les résultats d'un lot d'instances (voir get_stream_ids pour leurs identifiants)
+        """
+        if instance_ids is None:
+            instance_ids = itertools.repeat(None)
+        for instance_results, weight, instance_id in zip(chunk_results, weights, instance_ids):
+            self.add_results(instance_results, weight, instance_id)
+
+    def save_results(self):
+        """
+        Sauvegarde les résultats (stockage par colonnes, voir ResultStore) dans out/, et retourne leur dossier
+        """
+        path = self.path + "out/" + self.get_name()
+        self.results.save(path)
+        return path
+
+    "====================================="
+    "============= Checkpoint ============"
+    "====================================="
+
+    CHECKPOINT_STATE = "checkpoint.json"
+    CHECKPOINT_RESULTS = ["results_a", "results_b"]    # Les résultats sont sauvegardés alternativement dans chacun
+
+    def save_checkpoint(self, force=False):
+        """
+        Sauvegarde dans le dossier de reprise les résultats obtenus (voir ResultStore) et le nombre d'instances
+        déjà résolues, si checkpoint_interval secondes se sont écoulées depuis la dernière sauvegarde.
+        L'état est remplacé en une seule opération : une interruption pendant la sauvegarde laisse
+        la sauvegarde précédente intacte
+        """
+        if self.checkpoint is None:
+            return
+        if not force and time.perf_counter() - self.last_checkpoint < self.checkpoint_interval:
+            return
+        if len(self.results) != self.checkpoint_size:
+            state_path = os.path.join(self.checkpoint, self.CHECKPOINT_STATE)
+            previous = self.read_checkpoint_state()
+            previous_results = previous["results"] if previous is not None else None
+            results_name = self.CHECKPOINT_RESULTS[previous_results == self.CHECKPOINT_RESULTS[0]]
+            # Le dossier non référencé peut contenir une sauvegarde interrompue
+            shutil.rmtree(os.path.join(self.checkpoint, results_name), ignore_errors=True)
+            self.results.save(os.path.join(self.checkpoint, results_name))
+            state = self.get_checkpoint_description()
+            state["results"] = results_name
+            state["instances"] = len(self.results)
+            with open(state_path + ".tmp", "w") as file:
+                json.dump(state, file)
+            os.replace(state_path + ".tmp", state_path)
+            if previous_results is not None and previous_results != results_name:
+                shutil.rmtree(os.path.join(self.checkpoint, previous_results), ignore_errors=True)
+            self.checkpoint_size = len(self.results)
+        self.last_checkpoint = time.perf_counter()
+
+    def get_checkpoint_description(self):
+        """
+        Retourne tout ce dont dépendent les résultats sauvegardés : une sauvegarde n'est reprise que si
+        cette description est inchangée (agents et leur ordre, séquence, algorithmes et versions, instances)
+        """
+        return {"algorithms": [x.__name__ for x in self.algorithms],
+                "versions": [x.VERSION for x in self.algorithms],
+                "oracle_version": BordaOracle.VERSION,
+                "agents": self.get_profile_agents(),
+                "nb_items": self.initial_problem.number_of_items(),
+                "sequence": list(self.sequence.value),
+                "symmetric_agents": sorted(self.symmetric_agents),
+                "profile_file": self.profile_file.path if self.profile_file is not None else None,
+                "nb_instances": self.nb_instances,
+                "first_instance": self.first_instance}
+
+    def read_checkpoint_state(self):
+        """
+        Retourne l'état de la dernière sauvegarde du dossier de reprise, ou None s'il n'y en a pas
+        """
+        state_path = os.path.join(self.checkpoint, self.CHECKPOINT_STATE)
+        if not os.path.exists(state_path):
+            return None
+        with open(state_path) as file:
+            return json.load(file)
+
+    def load_checkpoint(self):
+        """
+        Recharge les résultats de la dernière sauvegarde du dossier de reprise.
+        Retourne le nombre d'instances déjà résolues (0 s'il n'y a pas de sauvegarde)
+        """
+        state = self.read_checkpoint_state()
+        if state is None:
+            return 0
+        # Les résultats ne seraient pas identiques à ceux d'une exécution sans interruption
+        different = [key for key, value in self.get_checkpoint_description().items() if state.get(key) != value]
+        if different:
+            raise ValueError("The checkpoint " + self.checkpoint + " was saved for another benchmark : "
+                             + ", ".join(different) + " differ")
+        # Copie en mémoire (et non projection) : les résultats suivants y sont ajoutés
+        self.results = ResultStore.load(os.path.join(self.checkpoint, state["results"]), mmap_mode=None)
+        self.checkpoint_size = state["instances"]
+        return state["instances"]
 
     def get_name(self):
         name = "Set_"
@@ -114,19 +705,31 @@ class ProblemSet(object):
         s += "| Problem         : " + self.initial_problem.name + "\n"
         s += "| Algorithms      : " + str([x.__name__ for x in self.algorithms]) + "\n"
         s += "| Sequence        : " + str(self.sequence) + "\n"
-        s += "| Nb of instances : " + str(len(self.problems)) + "\n"
+        s += "| Nb of instances : " + str(self.nb_instances) + "\n"
+        if self.symmetric_agents:
+            s += "| Symmetric agents: " + str(sorted(self.symmetric_agents)) + "\n"
         s += "| Nb of agents    : " + str(self.initial_problem.number_of_agents()) + "\n"
         s += "| Nb of items     : " + str(self.initial_problem.number_of_items()) + "\n"
         s += "|\n"
         s += "|-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=|"
         return s
 
+    def get_metrics_summary(self):
+        s = "|-=-=-=-=-=-=-=-=-= [ METRICS ]-=-=-=-=-=-=-=-=-=|\n"
+        for algorithm in self.algorithms:
+            s += "|\n"
+            s += "| " + algorithm.__name__ + "\n"
+            s += str(self.metrics[algorithm])
+        s += "|\n"
+        s += "|-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=|"
+        return s
+
     def show_results(self, save_only=False):
         fig = plt.figure()
         plt.style.use('ggplot')
 
         plt.suptitle(self.get_name().replace("_", " "), fontsize=14, fontweight='bold')
-        plt.title("Nombre d'instances : " + str(len(self.problems)))
+        plt.title("Nombre d'instances : " + str(self.nb_instances))
         plt.yticks(range(0,101,10))
         plt.ylim([0,100])
         plt.ylabel("% d'allocs vérifiant la propriété")
@@ -140,8 +743,7 @@ class ProblemSet(object):
         for i, algorithm in enumerate(self.algorithms):
             y = list()
             for borda_property in BordaProperty:
-                values = self.results[algorithm][borda_property]
-                y.append(sum(values) / len(values) * 100)
+                y.append(self.results.rate(algorithm.__name__, borda_property) * 100)
             plt.bar(X + i * gap, y, width=gap, label=algorithm.__name__)
 
         plt.legend(loc="best")
@@ -0,0 +1,136 @@
+# coding: utf8
+
+import numpy as np
+
+from src.Agent import Agent
+from src.BordaOracle import BordaOracle
+from src.Problem import Problem, BordaProperty
+
+
+class ProfileBatch(object):
+    """
+    Lot d'instances d'un même problème, stockées dans un seul tableau :
+    scores[n, i, j] est le score de Borda de l'item j pour l'agent i dans l'instance n.
+
+    Une allocation d'un lot est un tableau (instances x items) contenant, pour chaque item,
+    l'indice de l'agent qui le reçoit (-1 s'il n'est pas alloué)
+    """
+
+    UNALLOCATED = -1
+
+    def __init__(self, agents_name, items, scores, weights=None):
+        self.agents_name = list(agents_name)    # Ordre des agents dans le tableau (et départage des égalités)
+        self.items = items                      # Noms des items, pour reconstruire les problèmes
+        self.scores = scores
+        if weights is None:
+            weights = np.ones(scores.shape[0], dtype=np.int64)
+        self.weights = weights                  # Multiplicité de chaque instance
+        self.borda_optima = None                # Somme maximale et max min de chaque instance, calculés une fois
+
+    def __len__(self):
+        return self.scores.shape[0]
+
+    def number_of_agents(self):
+        return self.scores.shape[1]
+
+    def number_of_items(self):
+        return self.scores.shape[2]
+
+    def get_items_per_agent(self):
+        return self.number_of_items() // self.number_of_agents()
+
+    @staticmethod
+    def from_profiles(items, profiles, weights=None):
+        """
+        Construit un lot à partir de préférences (nom de l'agent -> classement des items, du plus au moins préféré).
+        Toutes les instances doivent avoir les mêmes agents, dans le même ordre
+        """
+        agents_name = list(profiles[0].keys())
+        rankings = np.array([[profile[name] for name in agents_name] for profile in profiles], dtype=np.int16)
+        if weights is not None:
+            weights = np.array(weights, dtype=np.int64)
+        return ProfileBatch.from_rankings(agents_name, items, rankings, weights)
+
+    @staticmethod
+    def from_rankings(agents_name, items, rankings, weights=None):
+        """
+        Construit un lot à partir d'un tableau de classements (instances x agents x items)
+        """
+        nb_items = rankings.shape[2]
+        scores = np.empty(rankings.shape, dtype=np.int16)
+        borda = np.broadcast_to(np.arange(nb_items, 0, -1, dtype=np.int16), rankings.shape)
+        np.put_along_axis(scores, rankings.astype(np.intp), borda, axis=2)
+        return ProfileBatch(agents_name, items, scores, weights)
+
+    def get_rankings(self, index):
+        """
+        Retourne les préférences de l'instance (nom de l'agent -> classement des items)
+        """
+        rankings = np.argsort(-self.scores[index], axis=1, kind="stable")
+        return {name: rankings[i].tolist() for i, name in enumerate(self.agents_name)}
+
+    def get_problem(self, index):
+        """
+        Reconstruit le problème correspondant à une instance du lot
+        """
+        problem = Problem(self.agents_name, self.items, initialize_agents=False)
+        agents = dict()
+        for name, ranking in self.get_rankings(index).items():
+            agents[name] = Agent(name, problem, ranking)
+        problem.force_agents(agents)
+        return problem
+
+    def get_allocation(self, problem):
+        """
+        Retourne l'allocation d'un problème au format d'un lot (une ligne)
+        """
+        allocation = np.full(problem.number_of_items(), self.UNALLOCATED, dtype=np.int16)
+        for index, name in enumerate(self.agents_name):
+            allocation[problem.agents[name].get_items()] = index
+        return allocation
+
+    "================================================"
+    "=============== Borda properties ==============="
+    "================================================"
+
+    def get_bundle_values(self, allocations):
+        """
+        Retourne le tableau (instances x agents x agents) de la valeur du lot de l'agent j pour l'agent i
+        """
+        owners = np.arange(self.number_of_agents(), dtype=allocations.dtype)
+        bundles = (allocations[:, None, :] == owners[None, :, None]).astype(np.int32)
+        return np.einsum("nim,njm->nij", self.scores.astype(np.int32), bundles)
+
+    def check_properties(self, allocations):
+        """
+        Détermine, pour chaque instance, si l'allocation vérifie chaque propriété de Borda.
+        Retourne un tableau de booléens (instances) par propriété
+        """
+        values = self.get_bundle_values(allocations)
+        utilities = np.diagonal(values, axis1=1, axis2=2)
+        envy = utilities[:, :, None] - values
+
+        properties = dict()
+        properties[BordaProperty.BE] = np.all(envy >= 0, axis=(1, 2))
+        properties[BordaProperty.BP] = properties[BordaProperty.BE] & np.any(envy > 0, axis=(1, 2))
+
+        max_sum, max_min = self.get_borda_optima()
+        properties[BordaProperty.BS] = utilities.sum(axis=1) == max_sum
+        properties[BordaProperty.BM] = utilities.min(axis=1) == max_min
+        return properties
+
+    def get_borda_optima(self):
+        """
+        Retourne la somme maximale et le max min des scores de Borda de chaque instance.
+        Ils ne dépendent que des préférences : ils sont calculés une seule fois pour tous les algorithmes
+        """
+        if self.borda_optima is None:
+            items_per_agent = self.get_items_per_agent()
+            max_sum = np.empty(len(self), dtype=np.int64)
+            max_min = np.empty(len(self), dtype=np.int64)
+            for index in range(len(self)):
+                scores = self.scores[index].tolist()
+                max_sum[index], _ = BordaOracle.max_borda_sum(scores, items_per_agent)
+                max_min[index], _ = BordaOracle.max_borda_max_min(scores, items_per_agent)
+            self.borda_optima = max_sum, max_min
+        return self.borda_optima
@@ -0,0 +1,138 @@
+# coding: utf8
+
+import itertools
+import json
+import math
+import os
+import shutil
+import numpy as np
+
+from src.ProfileBatch import ProfileBatch
+
+
+class ProfileFile(object):
+    """
+    Ensemble de préférences enregistré sur disque, pour réutiliser exactement les mêmes instances
+    (entre algorithmes, séquences ou machines) sans les regénérer.
+
+    Un fichier de préférences est un dossier contenant le tableau des classements (instances x agents x items,
+    un octet par item), la multiplicité de chaque instance, et les noms des agents et des items.
+    Les tableaux sont projetés en mémoire : une plage d'instances est lue sans copie, et un processus de calcul
+    ne reçoit que le chemin du dossier et sa plage
+    """
+
+    RANKINGS = "rankings.npy"
+    WEIGHTS = "weights.npy"
+    METADATA = "metadata.json"
+    WRITE_CHUNK = 4096      # Instances converties et écrites à la fois
+
+    def __init__(self, path, start=0, stop=None):
+        self.path = path
+        self.start = start
+        self.stop = stop
+        self.agents_name = None     # Ordre des agents dans les classements
+        self.items = None
+        self.rankings = None
+        self.weights = None
+        self.load()
+
+    def __getstate__(self):
+        # Les tableaux ne sont pas transmis aux processus de calcul : chacun les projette à nouveau
+        state = dict(self.__dict__)
+        state["rankings"] = None
+        state["weights"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.load()
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def load(self):
+        with open(os.path.join(self.path, self.METADATA)) as file:
+            metadata = json.load(file)
+        self.agents_name = metadata["agents"]
+        self.items = metadata["items"]
+        if self.stop is None:
+            self.stop = metadata["size"]
+        self.rankings = np.load(os.path.join(self.path, self.RANKINGS), mmap_mode="r")[self.start:self.stop]
+        self.weights = np.load(os.path.join(self.path, self.WEIGHTS), mmap_mode="r")[self.start:self.stop]
+
+    @staticmethod
+    def write(path, agents_name, items, profiles, size):
+        """
+        Enregistre des préférences et retourne le fichier ouvert
+        :param agents_name: Ordre des agents dans les préférences
+        :param profiles: Préférences (nom de l'agent -> classement des items) de chaque instance, avec sa multiplicité
+        :param size: Nombre maximal d'instances lues dans profiles (fini). Les fichiers ne contiennent que
+        les instances effectivement lues : rien n'est alloué d'avance
+        """
+        assert len(items) <= 256, "Rankings are stored with one byte per item"
+        if size is None or size == math.inf:
+            raise ValueError("Profiles can only be written from a finite stream (size)")
+        os.makedirs(path, exist_ok=True)
+        rankings_path = os.path.join(path, ProfileFile.RANKINGS)
+        weights_path = os.path.join(path, ProfileFile.WEIGHTS)
+
+        # Les données sont écrites par paquets à la suite, puis placées derrière l'en-tête .npy une fois
+        # le nombre d'instances connu
+        count = 0
+        profiles = itertools.islice(profiles, size)
+        with open(rankings_path + ".tmp", "wb") as rankings, open(weights_path + ".tmp", "wb") as weights:
+            while True:
+                chunk = list(itertools.islice(profiles, ProfileFile.WRITE_CHUNK))
+                if not chunk:
+                    break
+                rankings.write(np.array([[profile[name] for name in agents_name] for profile, _ in chunk],
+                                        dtype=np.uint8).tobytes())
+                weights.write(np.array([weight for _, weight in chunk], dtype=np.int64).tobytes())
+                count += len(chunk)
+        ProfileFile.write_array(rankings_path, np.uint8, (count, len(agents_name), len(items)))
+        ProfileFile.write_array(weights_path, np.int64, (count,))
+
+        with open(os.path.join(path, ProfileFile.METADATA), "w") as file:
+            json.dump({"agents": list(agents_name), "items": list(items), "size": count}, file)
+        return ProfileFile(path)
+
+    @staticmethod
+    def write_array(path, dtype, shape):
+        """
+        Crée le fichier .npy path à partir des données brutes (path + ".tmp") de ce type et de cette forme
+        """
+        header = {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": shape}
+        with open(path, "wb") as file, open(path + ".tmp", "rb") as raw:
+            np.lib.format.write_array_header_1_0(file, header)
+            shutil.copyfileobj(raw, file)
+        os.remove(path + ".tmp")
+
+    def select(self, start, stop):
+        """
+        Retourne la plage d'instances [start, stop[ (indices relatifs à ce fichier), sans copie
+        """
+        stop = min(stop, len(self))
+        return ProfileFile(self.path, self.start + start, self.start + stop)
+
+    def get_rankings(self, index):
+        """
+        Retourne les préférences d'une instance (nom de l'agent -> classement des items)
+        """
+        return {name: self.rankings[index, i].tolist() for i, name in enumerate(self.agents_name)}
+
+    def generate_profiles(self):
+        """
+        Génère les préférences de chaque instance, avec sa multiplicité
+        """
+        for index in range(len(self)):
+            yield self.get_rankings(index), int(self.weights[index])
+
+    def get_profiles(self):
+        return [self.get_rankings(index) for index in range(len(self))]
+
+    def get_batch(self):
+        """
+        Retourne les instances sous forme de lot (ProfileBatch)
+        """
+        return ProfileBatch.from_rankings(self.agents_name, self.items, self.rankings,
+                                          np.asarray(self.weights, dtype=np.int64))
@@ -0,0 +1,192 @@
+# coding: utf8
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+
+class ResultCache(object):
+    """
+    Cache persistant (fichier SQLite) des résultats des algorithmes et des oracles de Borda.
+
+    Chaque entrée est identifiée par l'empreinte (SHA-256) d'une description canonique de ce qui a été calculé :
+    préférences des agents, classe et version de l'algorithme, séquence. Les agents y sont désignés par leur position
+    dans le problème, et non par leur nom : les benchmarks dont les noms sont tirés au hasard à chaque exécution
+    réutilisent les mêmes entrées. Lorsque le cache dépasse max_entries entrées, les entrées les moins récemment
+    utilisées sont supprimées
+    """
+
+    ACCESS_BATCH = 1000     # Nombre de lectures dont les dates d'accès sont enregistrées ensemble
+
+    def __init__(self, path, max_entries=1000000):
+        self.path = path
+        self.max_entries = max_entries
+        self.connection = None
+        self.accessed = set()       # Clés lues depuis le dernier enregistrement des dates d'accès
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # La connexion n'est pas transmise aux processus de calcul : chacun ouvre la sienne
+        state = dict(self.__dict__)
+        state["connection"] = None
+        state["accessed"] = set()
+        return state
+
+    def connect(self):
+        if self.connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.path, timeout=60)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS entries ("
+                                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access REAL NOT NULL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            self.connection.commit()
+            self.size = self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.flush_accesses()
+            self.connection.close()
+            self.connection = None
+
+    def __len__(self):
+        self.connect()
+        return self.size
+
+    "====================================="
+    "=============== Keys ================"
+    "====================================="
+
+    @staticmethod
+    def get_key(description):
+        """
+        Retourne l'empreinte d'une description (objet JSON) canonique
+        """
+        encoded = json.dumps(description, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf8")).hexdigest()
+
+    @staticmethod
+    def describe_profile(problem):
+        """
+        Retourne la description canonique des préférences d'un problème : classement de chaque agent,
+        dans l'ordre du problème (qui sert à départager les égalités), items désignés par leur indice
+        """
+        return [list(agent.ordered_items) for agent in problem.agents.values()]
+
+    @staticmethod
+    def describe_sequence(problem, sequence):
+        """
+        Retourne la séquence, chaque agent étant désigné par sa position dans le problème
+        """
+        positions = {name: index for index, name in enumerate(problem.agents)}
+        return [positions[name] for name in sequence.value]
+
+    def get_run_key(self, problem, algorithm, sequence):
+        return self.get_key({"kind": "run",
+                             "algorithm": algorithm.__module__ + "." + algorithm.__qualname__,
+                             "version": algorithm.VERSION,
+                             "sequence": self.describe_sequence(problem, sequence),
+                             "profile": self.describe_profile(problem)})
+
+    def get_oracle_key(self, problem, oracle, version):
+        return self.get_key({"kind": "oracle",
+                             "oracle": oracle,
+                             "version": version,
+                             "profile": self.describe_profile(problem)})
+
+    "====================================="
+    "=============== Access =============="
+    "====================================="
+
+    def get(self, key):
+        """
+        Retourne la valeur associée à la clé, ou None
+        """
+        connection = self.connect()
+        row = connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Une lecture ne prend pas le verrou d'écriture : les dates d'accès sont enregistrées par paquets
+        self.accessed.add(key)
+        if len(self.accessed) >= self.ACCESS_BATCH:
+            self.flush_accesses()
+        return json.loads(row[0])
+
+    def flush_accesses(self, commit=True):
+        """
+        Enregistre la date d'accès des entrées lues depuis le dernier enregistrement (une seule transaction)
+        :param commit: Faux si la transaction est validée par l'appelant (voir put)
+        """
+        if not self.accessed or self.connection is None:
+            return
+        now = time.time()
+        self.connection.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                                    [(now, key) for key in self.accessed])
+        if commit:
+            self.connection.commit()
+        self.accessed.clear()
+
+    def put(self, key, value):
+        """
+        Enregistre la valeur (objet JSON) associée à la clé, puis applique la limite de taille
+        """
+        connection = self.connect()
+        self.flush_accesses(commit=False)
+        value = json.dumps(value, separators=(",", ":"))
+        inserted = connection.execute("INSERT OR IGNORE INTO entries (key, value, last_access) VALUES (?, ?, ?)",
+                                      (key, value, time.time())).rowcount
+        if inserted:
+            self.size += 1
+        else:
+            connection.execute("UPDATE entries SET value = ?, last_access = ? WHERE key = ?",
+                               (value, time.time(), key))
+        if self.size > self.max_entries:
+            # Le compte est relu : d'autres processus peuvent écrire dans le même fichier
+            self.size = connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            excess = self.size - self.max_entries
+            if excess > 0:
+                connection.execute("DELETE FROM entries WHERE key IN "
+                                   "(SELECT key FROM entries ORDER BY last_access ASC LIMIT ?)", (excess,))
+                self.size -= excess
+        connection.commit()
+
+    def get_run(self, problem, algorithm, sequence):
+        """
+        Retourne le résultat enregistré de l'algorithme sur ce problème : allocation (nom de l'agent -> lot),
+        statut, raison et propriétés de Borda. None s'il n'a jamais été calculé
+        """
+        value = self.get(self.get_run_key(problem, algorithm, sequence))
+        if value is not None:
+            value["allocation"] = dict(zip(problem.agents, value["allocation"]))
+        return value
+
+    def put_run(self, problem, algorithm, sequence, instance):
+        """
+        Enregistre le résultat de l'instance d'algorithme (déjà calculée) sur ce problème
+        """
+        self.put(self.get_run_key(problem, algorithm, sequence),
+                 {"allocation": [instance.problem.agents[name].bundle for name in problem.agents],
+                  "status": instance.status.name,
+                  "reason": instance.reason,
+                  "properties": {x.name: list(value) for x, value in instance.problem.borda_properties.items()}})
+
+    def get_oracle(self, problem, oracle, version):
+        """
+        Retourne la valeur optimale et l'allocation témoin (nom de l'agent -> lot) enregistrées pour un oracle
+        """
+        value = self.get(self.get_oracle_key(problem, oracle, version))
+        if value is None:
+            return None
+        return value["value"], dict(zip(problem.agents, value["allocation"]))
+
+    def put_oracle(self, problem, oracle, version, value, allocation):
+        self.put(self.get_oracle_key(problem, oracle, version),
+                 {"value": value, "allocation": [allocation[name] for name in problem.agents]})
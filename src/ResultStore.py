@@ -0,0 +1,137 @@
+# coding: utf8
+
+import json
+import os
+import numpy as np
+
+from src.Problem import BordaProperty
+
+
+class ResultStore(object):
+    """
+    Résultats d'un ensemble d'instances, stockés par colonnes (tableaux NumPy de taille fixe) :
+    identifiant et multiplicité de chaque instance, puis une colonne de booléens par algorithme et propriété de Borda.
+
+    Un stockage sauvegardé est un dossier contenant un fichier .npy par colonne. Rechargé avec load, les colonnes
+    sont projetées en mémoire (memory mapping) : les agrégations ne lisent que les colonnes utilisées
+    """
+
+    INSTANCE = "instance"
+    WEIGHT = "weight"
+    METADATA = "metadata.json"
+
+    def __init__(self, algorithms_name, capacity=1024, agents_name=None):
+        """
+        :param agents_name: Ordre des agents dans lequel les identifiants d'instances sont définis
+        (voir ProblemSet.get_instance_id), enregistré avec les résultats
+        """
+        self.algorithms_name = list(algorithms_name)
+        self.agents_name = list(agents_name) if agents_name is not None else None
+        self.size = 0
+        self.columns = dict()
+        self.columns[self.INSTANCE] = np.empty(capacity, dtype=np.int64)
+        self.columns[self.WEIGHT] = np.empty(capacity, dtype=np.int64)
+        for algorithm_name in self.algorithms_name:
+            for borda_property in BordaProperty:
+                self.columns[self.get_column_name(algorithm_name, borda_property)] = np.empty(capacity, dtype=np.bool_)
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def get_column_name(algorithm_name, borda_property):
+        return algorithm_name + "." + borda_property.name
+
+    "====================================="
+    "=============== Append =============="
+    "====================================="
+
+    def append(self, instance, weight, instance_results):
+        """
+        :param instance: Identifiant de l'instance
+        :param weight: Multiplicité de l'instance
+        :param instance_results: Pour chaque algorithme (dans l'ordre du stockage), les propriétés de Borda
+        vérifiées par son allocation
+        """
+        if self.size == len(self.columns[self.INSTANCE]):
+            self.grow()
+        self.columns[self.INSTANCE][self.size] = instance
+        self.columns[self.WEIGHT][self.size] = weight
+        for algorithm_name, properties in zip(self.algorithms_name, instance_results):
+            for borda_property, value in properties.items():
+                self.columns[self.get_column_name(algorithm_name, borda_property)][self.size] = value
+        self.size += 1
+
+    def grow(self):
+        """
+        Double la capacité de chaque colonne
+        """
+        for name, column in self.columns.items():
+            grown = np.empty(max(1, 2 * len(column)), dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    "====================================="
+    "=============== Query ==============="
+    "====================================="
+
+    def get_column(self, name):
+        return self.columns[name][:self.size]
+
+    def get_instances(self):
+        return self.get_column(self.INSTANCE)
+
+    def get_weights(self):
+        return self.get_column(self.WEIGHT)
+
+    def get_values(self, algorithm_name, borda_property):
+        return self.get_column(self.get_column_name(algorithm_name, borda_property))
+
+    def count(self, algorithm_name, borda_property):
+        """
+        Retourne le nombre (pondéré par les multiplicités) d'instances dont l'allocation vérifie la propriété
+        """
+        return int(np.dot(self.get_values(algorithm_name, borda_property), self.get_weights()))
+
+    def rate(self, algorithm_name, borda_property):
+        """
+        Retourne la proportion (pondérée par les multiplicités) d'instances dont l'allocation vérifie la propriété
+        """
+        total = int(self.get_weights().sum())
+        if not total:
+            return 0.0
+        return self.count(algorithm_name, borda_property) / total
+
+    def get_rates(self):
+        """
+        Retourne, pour chaque algorithme, la proportion d'instances vérifiant chaque propriété
+        """
+        return {algorithm_name: {x: self.rate(algorithm_name, x) for x in BordaProperty}
+                for algorithm_name in self.algorithms_name}
+
+    "====================================="
+    "=============== Files ==============="
+    "====================================="
+
+    def save(self, path):
+        """
+        Sauvegarde les colonnes dans le dossier path (un fichier .npy par colonne)
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in self.columns:
+            np.save(os.path.join(path, name + ".npy"), self.get_column(name))
+        with open(os.path.join(path, self.METADATA), "w") as file:
+            json.dump({"algorithms": self.algorithms_name, "agents": self.agents_name, "size": self.size}, file)
+
+    @staticmethod
+    def load(path, mmap_mode="r"):
+        """
+        Ouvre un stockage sauvegardé. Par défaut, les colonnes sont projetées en mémoire en lecture seule
+        """
+        with open(os.path.join(path, ResultStore.METADATA)) as file:
+            metadata = json.load(file)
+        store = ResultStore(metadata["algorithms"], capacity=0, agents_name=metadata.get("agents"))
+        for name in store.columns:
+            store.columns[name] = np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode)
+        store.size = metadata["size"]
+        return store
@@ -1,5 +1,6 @@
 # coding: utf8
 
+import math
 from enum import Enum
 
 
@@ -9,3 +10,56 @@ class AutoNumber(Enum):
         obj = object.__new__(cls)
         obj._value_ = value
         return obj
+
+
+def iter_bits(mask):
+    """
+    Parcourt les indices des bits à 1 d'un masque, du plus petit au plus grand
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def rank_permutation(permutation):
+    """
+    Retourne le rang d'une permutation de range(n) dans l'ordre lexicographique (code de Lehmer)
+    """
+    n = len(permutation)
+    remaining = list(range(n))
+    rank = 0
+    for index, value in enumerate(permutation):
+        position = remaining.index(value)
+        rank += position * math.factorial(n - 1 - index)
+        del remaining[position]
+    return rank
+
+
+def unrank_permutation(rank, n):
+    """
+    Retourne la permutation de range(n) de ce rang dans l'ordre lexicographique
+    """
+    remaining = list(range(n))
+    permutation = list()
+    for index in range(n):
+        position, rank = divmod(rank, math.factorial(n - 1 - index))
+        permutation.append(remaining.pop(position))
+    return permutation
+
+
+def next_permutation(permutation):
+    """
+    Remplace la permutation (liste) par la suivante dans l'ordre lexicographique.
+    Retourne faux si c'était la dernière : elle est alors remplacée par la première
+    """
+    i = len(permutation) - 2
+    while i >= 0 and permutation[i] >= permutation[i + 1]:
+        i -= 1
+    if i >= 0:
+        j = len(permutation) - 1
+        while permutation[j] <= permutation[i]:
+            j -= 1
+        permutation[i], permutation[j] = permutation[j], permutation[i]
+    permutation[i + 1:] = reversed(permutation[i + 1:])
+    return i >= 0
@@ -1,8 +1,14 @@
 from .Agent import Agent
+from .BordaOracle import BordaOracle
 from .Database import Database
+from .Metrics import Metrics
 from .Problem import Problem
 from .Problem import BordaProperty
 from .ProblemSet import ProblemSet
+from .ProfileBatch import ProfileBatch
+from .ProfileFile import ProfileFile
+from .ResultCache import ResultCache
+from .ResultStore import ResultStore
 from .Sequence import Sequence
 from .Sequence import SequenceType
 from .Utility import AutoNumber